@@ -1,62 +1,60 @@
+import os
+import sys
+if __package__ in (None, ""):
+    # Started as "python p4.py" from hw1/ (see README.md), the voting package sits in the repository root
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from voting.profiles import anonymous_profile
+from voting.ballot_files import read_profile
+
 def load_and_extract_file(file_name: str) -> tuple:
     '''
         $ The purpose of this method is to provide a convenient data structure based on input data
-        $ For fun, I attempted my hand at functional programming! :) 
         $ Input: dataset.txt (or a text file with a certain format)
         $ Output: weight vector (read in as is - no transpose required)
                   profile matrix (list of list - inner list representing a ballot - transpose required) 
+        $ The parsing itself lives in read_profile, nothing is cached
     '''
-    # Read file, store to dataset var
-    with open(file=file_name, mode="r") as f:
-        dataset = f.readlines()
-    
-    # Refine each string to remove spaces and new line characters
-    dataset = list(map(lambda x: x.replace(" ", "").rstrip("\n"), dataset))    
-    
-    # Take only the sublists which have length > 1 (these are rows of profiles)
-    profile = list(map(lambda x: list(map(lambda z: str(z), x)) , filter(lambda y: len(y) > 1, dataset)))
-    
-    # This is the transpose (this converst the list from rows of profiles (positions) to a preference ordering)
-    profile = [[profile[j][i] for j in range(len(profile))] for i in range(len(profile[0]))]
-    
-    # These are just single element sublists (presumably they are the weight vectors)
-    weight = list(map(lambda x: int(x), filter(lambda y: len(y) == 1, dataset)))
-    
+    ballots, alternatives, weight = read_profile(file_name)
+    profile = [[alternatives[i] for i in ballot] for ballot in ballots.tolist()]
     return profile, weight 
 
-def compute_positional_score(profile: list, weight: list) -> str:
+def positional_scores(profile, weight):
+    '''
+        $ Score of every alternative under the positional scoring rule given by the weight vector
+        $ Input: profile (list of ballots, anonymous_profile or profile_store), weight vector or a matrix of them (one rule per row)
+        $ Output: dictionary alternative -> score, or a list of them (one per rule) for a weight matrix
+        $ All rules are scored in one pass over the profile, see anonymous_profile.positional_scores
+    '''
+    if not isinstance(profile, anonymous_profile):
+        # Alternatives in the order of the first ballot, one row per ballot
+        alternatives = tuple(profile[0])
+        profile = anonymous_profile.from_voters(dict(enumerate(profile)), alternatives)
+    scores = profile.positional_scores(weight)
+    if scores.ndim == 1:
+        return dict(zip(profile.alternatives, scores.tolist()))
+    return [dict(zip(profile.alternatives, row)) for row in scores.tolist()]
+
+def compute_positional_score(profile, weight: list) -> str:
     '''
         $ This method applies the positional voting rule 
-            $ Initially it defines a score dictionary where the keys are the alternatives and values are zeros
-            $ Iterate over each element of profile -> update score dictionary by accessing keys
-            $ Return alternative with highest score 
-        $ I was not able to do purely functional programming here :(
-        $ Input: profile, weight vector
+            $ Score every alternative (positional_scores) and return the alternative with highest score
+        $ Input: profile (list of ballots, anonymous_profile or profile_store), weight vector
         $ Output: the winning candidate
     '''
-
-    # Initialize score dictionary
-    score = {element: 0 for element in profile[0]}
-
-    # Iterate by row
-    for i in range(len(profile)):
-        # Iterate by col
-        for j in range(len(profile[i])):
-            # Update score by weight
-            score[profile[i][j]] = score[profile[i][j]] + weight[j]
+    score = positional_scores(profile, weight)
     # Get maximal element by value
-    print(score)
     return max(score.items(), key=lambda x: x[1])[0]
     
     
 if __name__ == "__main__":
     # Entry point - PLEASE MAKE SURE TO SPECIFY DATASET FILE HERE BY PATH
-    #               CURRENTLY THIS ASSUMES .TXT FILE EXISTS IN THE SAME DIRECTORY
-    profile, weight = load_and_extract_file("dataset.txt")
+    #               CURRENTLY THIS ASSUMES .TXT FILE EXISTS IN THE SAME DIRECTORY AS THIS SCRIPT
+    profile, weight = load_and_extract_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset.txt"))
     
     # Uncomment below line for printing purposes
     # print(profile, weight)
 
     # Make the call and determine the winner
+    print(positional_scores(profile, weight))
     winner = compute_positional_score(profile, weight)
     print("The [positional scoring rule] winner is: {}" .format(winner))
\ No newline at end of file
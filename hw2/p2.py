@@ -1,25 +1,294 @@
+import os
+import sys
+import heapq
 import itertools
-from tabulate import tabulate
-def kemeny_winner(voting_profile: dict, alternatives: tuple) -> set:
-    '''
-        This function computes the number of disagreements between two ballots and returns kendall-tau distance
-        It also prints a tabulated version of each disagreement
-    '''
-    disagreements = lambda x, y: sum(map (lambda pair: (x.index(pair[0]) < x.index(pair[1])) != (y.index(pair[0]) < y.index(pair[1])), all_pairs))
-    all_linear_orderings = tuple(itertools.permutations(alternatives))
-    all_pairs = tuple(itertools.combinations(alternatives, 2))
-    ballots = tuple(voting_profile.values())
-    counts = {}
-    for ordering in all_linear_orderings:
-        count = 0
-        for ballot in ballots:
-            # print(f"Comparing {ballot} with {ordering}")
-            count = count + disagreements(ordering, ballot)
-            counts.update({ordering: count})
-    print("\n")
-    counts = dict(sorted(counts.items(), key=lambda counts: counts[1]))
-    print(tabulate([(k, v) for k,v in counts.items()], headers=["ordering", "distance"], tablefmt="grid"))
-    return {k[0] for k,v in counts.items() if counts[k] == min(counts.values())}   
+import numpy as np
+if __package__ in (None, ""):
+    # Started as "python p2.py" from hw2/ (see README.md), the voting package sits in the repository root
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from voting.profiles import anonymous_profile
+
+# Majority matrix held by each process pool worker (see utils.share_pairs)
+shared_pairs = None
+
+def kemeny_winner(voting_profile, alternatives: tuple, method: str = "exact", processes: int = None) -> set:
+    '''
+        Return the Kemeny winners, i.e the first alternatives of the rankings with the smallest total kendall-tau distance to the ballots
+            method = "exact" solves from the weighted majority matrix by dynamic programming over subsets (see kemeny_rankings)
+                     or, given a number of processes, by branch and bound sharded over a process pool (see kemeny_parallel)
+            method = "approximate" returns the head of a locally optimal ranking, for candidate sets too large to solve (see kemeny_approximation)
+            method = "enumerate" streams every linear ordering and keeps the closest ones (see kemeny_enumeration)
+        The profile is either a dict of voter -> ballot or an anonymous_profile, whose ballots are weighted by their multiplicity
+    '''
+    if method == "enumerate":
+        return kemeny_enumeration(voting_profile, alternatives)
+    elif method == "approximate":
+        ranking, _, _ = kemeny_approximation(voting_profile, alternatives)
+        return {ranking[0]}
+    elif method != "exact":
+        raise ValueError(f"unknown Kemeny method {method}")
+    elif processes is not None:
+        # One optimal ordering per shard is enough to know its head
+        _, rankings = kemeny_parallel(voting_profile, alternatives, processes, limit=1)
+        return {ranking[0] for ranking in rankings}
+
+    pairs = pairwise_counts(voting_profile, alternatives)
+    cost = kemeny_dynamic_program(pairs)
+    everyone = len(cost) - 1
+    # Putting c first costs every voter that prefers someone to c, plus the best ordering of everybody else
+    return {alternatives[c] for c in range(len(alternatives)) if pairs[:, c].sum() + cost[everyone ^ (1 << c)] == cost[everyone]}
+
+def kemeny_rankings(voting_profile, alternatives: tuple, limit: int = None) -> tuple:
+    '''
+        Exact Kemeny rankings, returns the optimal total kendall-tau distance and the optimal rankings (at most limit of them)
+        This works from the weighted majority matrix so the number of voters drops out, O(2^m * m) time and O(2^m) memory
+    '''
+    pairs = pairwise_counts(voting_profile, alternatives)
+    cost = kemeny_dynamic_program(pairs)
+    everyone = len(cost) - 1
+    rankings = []
+    # Walk back from the full set, every alternative whose removal is consistent with the optimum can be ranked last
+    stack = [(everyone, ())]
+    while stack and (limit is None or len(rankings) < limit):
+        subset, tail = stack.pop()
+        if subset == 0:
+            rankings.append(tuple(alternatives[c] for c in tail))
+            continue
+        for c in reversed(range(len(alternatives))):
+            rest = subset ^ (1 << c)
+            if subset >> c & 1 and cost[rest] + utils.cost_to_append(pairs, c, rest) == cost[subset]:
+                stack.append((rest, (c,) + tail))
+    return int(cost[everyone]), rankings
+
+def kemeny_parallel(voting_profile, alternatives: tuple, processes: int = None, prefix_length: int = 1, limit: int = None) -> tuple:
+    '''
+        Exact Kemeny rankings by branch and bound, with the ordering space sharded by its first prefix_length alternatives over a process pool
+        Every worker holds a read-only copy of the majority matrix and starts from the distance of the approximate ranking as upper bound
+        Returns the optimal total kendall-tau distance and the optimal rankings, merged from the local optima of the shards
+        With limit every shard keeps at most limit optimal orderings and prunes ties once it has them, so the merged list holds at most
+        limit rankings per shard and still one for every shard at the optimum (kemeny_winner only needs their heads)
+    '''
+    if not isinstance(voting_profile, anonymous_profile):
+        voting_profile = anonymous_profile.from_dict(voting_profile, alternatives)
+    pairs = pairwise_counts(voting_profile, alternatives)
+    _, upper_bound, _ = kemeny_approximation(voting_profile, alternatives)
+
+    # Imported on first use, plain computation never pays for the pool machinery
+    import multiprocessing
+
+    prefixes = itertools.permutations(range(len(alternatives)), min(prefix_length, len(alternatives)))
+    with multiprocessing.Pool(processes, initializer=utils.share_pairs, initargs=(pairs.tolist(),)) as pool:
+        results = pool.starmap(utils.search_prefix, [(prefix, upper_bound, limit) for prefix in prefixes])
+
+    # Shards that were pruned entirely come back without orderings
+    distance = min(local for local, orderings in results if orderings)
+    rankings = [tuple(alternatives[c] for c in ordering) for local, orderings in results if local == distance for ordering in orderings]
+    return distance, rankings
+
+def kemeny_approximation(voting_profile, alternatives: tuple, seed: str = "borda") -> tuple:
+    '''
+        Approximate Kemeny ranking for large candidate sets, returns (ranking, kendall-tau distance, lower bound on the optimal distance)
+        The ranking is seeded by Borda or Copeland score and then improved by moving single alternatives until no move helps
+        The lower bound charges every pair the minority side of its majority contest, so distance - lower bound bounds the gap to optimal
+        Everything runs on the m x m majority matrix
+    '''
+    pairs = pairwise_counts(voting_profile, alternatives)
+    margins = pairs - pairs.T
+    if seed == "borda":
+        score = pairs.sum(axis=1)
+    elif seed == "copeland":
+        score = np.sign(margins).sum(axis=1)
+    else:
+        raise ValueError(f"unknown seed rule {seed}")
+    order = list(np.argsort(-score, kind="stable"))
+
+    # Local search by insertion: moving x from position p to q changes the distance by the margins of x against everything it jumps over
+    improved = True
+    while improved:
+        improved = False
+        for x in list(order):
+            p = order.index(x)
+            row = margins[x, order]
+            # Moving x up to position q < p costs -(margins of x over order[q:p]), moving it down to q > p costs margins over order[p+1:q+1]
+            up = -np.cumsum(row[:p][::-1])[::-1]
+            down = np.cumsum(row[p+1:])
+            deltas = np.concatenate((up, [0], down))
+            q = int(np.argmin(deltas))
+            if deltas[q] < 0:
+                order.pop(p)
+                order.insert(q, x)
+                improved = True
+
+    ranked = pairs[np.ix_(order, order)]
+    distance = int(np.tril(ranked, -1).sum())
+    lower_bound = int(np.minimum(pairs, pairs.T)[np.triu_indices(len(pairs), 1)].sum())
+    return tuple(alternatives[c] for c in order), distance, lower_bound
+
+def pairwise_counts(voting_profile, alternatives: tuple) -> np.ndarray:
+    '''
+        Weighted majority matrix in the order of alternatives, entry [i][j] is the number of voters that rank i above j
+    '''
+    if not isinstance(voting_profile, anonymous_profile):
+        voting_profile = anonymous_profile.from_dict(voting_profile, alternatives)
+    return voting_profile.majority_matrix.restrict(alternatives).pairs
+
+def kemeny_dynamic_program(pairs: np.ndarray) -> np.ndarray:
+    '''
+        cost[S] is the smallest number of pairwise disagreements with the voters achievable by an ordering of the subset S (a bitmask)
+        cost[S] = min over c in S of cost[S - c] + (voters preferring c to the rest of S), c being ranked last within S
+        Subsets are processed one size at a time so that each size is a handful of vectorized passes
+    '''
+    num_alternatives = len(pairs)
+    subsets = np.arange(1 << num_alternatives, dtype=np.int64)
+    size = np.zeros(1 << num_alternatives, dtype=np.int8)
+    for c in range(num_alternatives):
+        size[1 << c: 1 << (c+1)] = size[:1 << c] + 1
+    layers = np.argsort(size, kind="stable")
+    bounds = np.searchsorted(size[layers], np.arange(num_alternatives + 2))
+
+    cost = np.zeros(1 << num_alternatives, dtype=np.int64)
+    append_tables = [utils.append_table(pairs[c]) for c in range(num_alternatives)]
+    for k in range(1, num_alternatives + 1):
+        layer = subsets[layers[bounds[k]:bounds[k+1]]]
+        best = np.full(len(layer), np.iinfo(np.int64).max)
+        for c in range(num_alternatives):
+            has_c = (layer >> c & 1).astype(bool)
+            rest = layer[has_c] ^ (1 << c)
+            best[has_c] = np.minimum(best[has_c], cost[rest] + utils.lookup_append_cost(append_tables[c], rest))
+        cost[layer] = best
+    return cost
+
+class utils:
+    '''
+        Helpers for the Kemeny dynamic program
+    '''
+
+    def append_table(row: np.ndarray) -> tuple:
+        '''
+            Cost of ranking an alternative right after a subset T is the sum of row[j] over j in T
+            Split into two tables over the low and high halves of the bitmask so that each table has only 2^(m/2) entries
+        '''
+        half = len(row) // 2
+        low = np.zeros(1 << half, dtype=np.int64)
+        for j in range(half):
+            low[1 << j: 1 << (j+1)] = low[:1 << j] + row[j]
+        high = np.zeros(1 << (len(row) - half), dtype=np.int64)
+        for j in range(len(row) - half):
+            high[1 << j: 1 << (j+1)] = high[:1 << j] + row[half + j]
+        return half, low, high
+
+    def lookup_append_cost(table: tuple, subsets: np.ndarray) -> np.ndarray:
+        '''
+            Vectorized lookup into a table made by append_table
+        '''
+        half, low, high = table
+        return low[subsets & ((1 << half) - 1)] + high[subsets >> half]
+
+    def kendall_tau_distance(orderings: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+        '''
+            Total kendall-tau distance between each ordering (a row of alternative indices) and the voters
+            Every pair placed as (earlier, later) disagrees with the voters that prefer later to earlier
+        '''
+        distance = np.zeros(len(orderings), dtype=np.int64)
+        for p in range(orderings.shape[1] - 1):
+            distance += pairs[orderings[:, p+1:], orderings[:, p:p+1]].sum(axis=1)
+        return distance
+
+    def share_pairs(pairs: list):
+        '''
+            Process pool initializer, every worker keeps the majority matrix for all the prefixes it searches
+        '''
+        global shared_pairs
+        shared_pairs = pairs
+
+    def search_prefix(prefix: tuple, upper_bound: int, limit: int = None) -> tuple:
+        '''
+            Branch and bound over the orderings starting with prefix, returns the best distance and the orderings achieving it
+            The bound charges every pair that is still unordered the minority side of its majority contest
+            Orderings are kept if they are no worse than upper_bound, so ties with the global optimum survive the pruning
+            Once limit orderings at the best distance are kept, branches that can only tie it are cut as well
+        '''
+        pairs = shared_pairs
+        minority = [[min(pairs[i][j], pairs[j][i]) for j in range(len(pairs))] for i in range(len(pairs))]
+        remaining = [c for c in range(len(pairs)) if c not in prefix]
+        cost = sum(pairs[prefix[q]][prefix[p]] for p in range(len(prefix)) for q in range(p+1, len(prefix)))
+        cost += sum(pairs[y][x] for x in prefix for y in remaining)
+        bound = sum(minority[i][j] for i, j in itertools.combinations(remaining, 2))
+        best = [upper_bound, []]
+
+        def branch(order, remaining, cost, bound):
+            full = limit is not None and len(best[1]) >= limit
+            if cost + bound > best[0] or (full and cost + bound == best[0]):
+                return
+            if not remaining:
+                if cost < best[0]:
+                    best[0], best[1] = cost, []
+                best[1].append(tuple(order))
+                return
+            # Try the cheapest next alternative first so that good orderings tighten the bound early
+            children = []
+            for c in remaining:
+                rest = [y for y in remaining if y != c]
+                children.append((sum(pairs[y][c] for y in rest), c, rest))
+            for added, c, rest in sorted(children):
+                branch(order + [c], rest, cost + added, bound - sum(minority[c][y] for y in rest))
+
+        branch(list(prefix), remaining, cost, bound)
+        return best[0], best[1]
+
+    def cost_to_append(pairs: np.ndarray, c: int, subset: int) -> int:
+        '''
+            Number of voters preferring c to the members of subset (i.e the cost of ranking c after all of them)
+        '''
+        return int(sum(pairs[c][j] for j in range(len(pairs)) if subset >> j & 1))
+
+def kemeny_enumeration(voting_profile, alternatives: tuple, top_k: int = None, report: bool = False, batch_size: int = 65536) -> set:
+    '''
+        This function streams every linear ordering, computes its total kendall-tau distance to the ballots and returns the Kemeny winners
+        Only the best distance with the set of alternatives that head an ordering at that distance, and a bounded heap of the top_k
+        closest orderings, are kept, so memory does not grow with m! even when every ordering is optimal
+        With report = True it also prints a tabulated version of the heap (the 10 closest orderings when top_k is not given)
+        The profile is either a dict of voter -> ballot or an anonymous_profile, whose ballots are weighted by their multiplicity
+    '''
+    pairs = pairwise_counts(voting_profile, alternatives)
+    all_linear_orderings = itertools.permutations(range(len(alternatives)))
+    best_distance, winners = None, set()
+    # Max heap (by negated distance) of the top_k closest orderings seen so far, the counter keeps entries comparable
+    top_k = top_k or (10 if report else 0)
+    heap, counter = [], itertools.count()
+    while True:
+        # Distances are evaluated a batch of orderings at a time
+        batch = np.fromiter(itertools.chain.from_iterable(itertools.islice(all_linear_orderings, batch_size)), dtype=np.int64)
+        if batch.size == 0:
+            break
+        batch = batch.reshape(-1, len(alternatives))
+        distance = utils.kendall_tau_distance(batch, pairs)
+
+        # Keep the heads of the best orderings
+        low = distance.min()
+        if best_distance is None or low < best_distance:
+            best_distance, winners = low, set()
+        if low == best_distance:
+            winners.update(np.unique(batch[distance == low, 0]).tolist())
+
+        # Keep the top_k heap, only the top_k closest orderings of the batch can enter it
+        if top_k:
+            closest = np.argsort(distance, kind="stable")[:top_k]
+            for idx in closest.tolist():
+                entry = (-int(distance[idx]), -next(counter), tuple(batch[idx].tolist()))
+                if len(heap) < top_k:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+
+    if report:
+        # Display library, only loaded when a report is asked for
+        from tabulate import tabulate
+        kept = sorted((-d, -c, ordering) for d, c, ordering in heap)
+        rows = [(tuple(alternatives[x] for x in ordering), d) for d, _, ordering in kept]
+        print("\n")
+        print(tabulate(rows, headers=["ordering", "distance"], tablefmt="grid"))
+    return {alternatives[x] for x in winners}
 
 
 if __name__ == "__main__":
@@ -1,22 +1,102 @@
-import networkx as nx
-import matplotlib.pyplot as plt
+import os
+import sys
+import string
+from xml.sax.saxutils import quoteattr
+if __package__ in (None, ""):
+    # Started as "python p4.py" from hw2/ (see README.md), the voting package sits in the repository root
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from voting.profiles import anonymous_profile, tournament
 
-def generate_graph(adjacency_matrix: list, G):
+def generate_graph(adjacency_matrix: list, G = None, labels: tuple = None, show: bool = False):
     '''
         This function just generates a graph with a respectable visual :)
+        networkx and matplotlib are only imported here, when a picture is actually requested
     '''
-    mapping = {0: 'a', 1: 'b', 2: 'c', 3: 'd', 4: 'e', 5: 'f', 6: 'g'}
-    for i in range(len(adjacency_matrix)):
-        for j in range(len(adjacency_matrix[i])):
-            if adjacency_matrix[i][j] == 1:
-                G.add_edge(mapping[i], mapping[j])
+    import networkx as nx
+    import matplotlib.pyplot as plt
+
+    if G is None:
+        G = nx.DiGraph()
+    graph = utils.to_tournament(adjacency_matrix, labels)
+    G.add_edges_from(utils.edges(graph))
 
     pos = nx.circular_layout(G)
     nx.draw(G, pos, with_labels = True, node_color = "skyblue", node_size = 2000, edge_color = "black", arrows = True, font_size = 15)
     edge_labels = nx.get_edge_attributes(G, 'weight')
     nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels)
-    print(dir(G))
-    # plt.show()
+    if show:
+        plt.show()
+    return G
+
+def export_graphs(graphs, directory: str, labels: tuple = None, fmt: str = "dot") -> list:
+    '''
+        Write the majority graph of every item of graphs to its own file in directory (graph_1.dot, graph_2.dot, ...) in one pass
+        An item is a 0/1 adjacency matrix, an anonymous_profile or a tournament; fmt is "dot", "graphml" or "edgelist"
+        Nothing but the standard library is needed, so this runs headless and without the plotting stack
+        Returns the paths written
+    '''
+    writer = {"dot": utils.write_dot, "graphml": utils.write_graphml, "edgelist": utils.write_edgelist}[fmt]
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for idx, item in enumerate(graphs):
+        path = os.path.join(directory, f"graph_{idx+1}.{fmt}")
+        with open(path, "w") as handle:
+            writer(utils.to_tournament(item, labels), handle, f"graph_{idx+1}")
+        paths.append(path)
+    return paths
+
+class utils:
+    '''
+        Helpers for turning majority graphs into files
+    '''
+
+    def to_tournament(item, labels: tuple = None) -> tournament:
+        '''
+            Majority graph of an adjacency matrix, an anonymous_profile or a tournament
+            Matrix rows are named by labels (a, b, c, ... by default)
+        '''
+        if isinstance(item, tournament):
+            return item
+        if isinstance(item, anonymous_profile):
+            return item.majority_matrix.tournament
+        if labels is None:
+            labels = tuple(string.ascii_lowercase[:len(item)]) if len(item) <= 26 else tuple(str(i) for i in range(len(item)))
+        return tournament.from_matrix(item, labels)
+
+    def edges(graph: tournament) -> list:
+        '''
+            (winner, loser) label pairs of the majority graph
+        '''
+        return [(graph.alternatives[i], graph.alternatives[j]) for i in graph.members() for j in graph.members(graph.beats[i] & graph.present)]
+
+    def write_dot(graph: tournament, handle, name: str):
+        '''
+            Graphviz digraph, one line per node and per edge
+        '''
+        quote = lambda label: '"' + str(label).replace('\\', '\\\\').replace('"', '\\"') + '"'
+        lines = [f"digraph {name} {{"]
+        lines += [f"    {quote(graph.alternatives[i])};" for i in graph.members()]
+        lines += [f"    {quote(winner)} -> {quote(loser)};" for winner, loser in utils.edges(graph)]
+        lines.append("}")
+        handle.write("\n".join(lines) + "\n")
+
+    def write_graphml(graph: tournament, handle, name: str):
+        '''
+            GraphML document with a directed graph
+        '''
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+                 '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">',
+                 f'  <graph id={quoteattr(name)} edgedefault="directed">']
+        lines += [f'    <node id={quoteattr(str(graph.alternatives[i]))}/>' for i in graph.members()]
+        lines += [f'    <edge source={quoteattr(str(winner))} target={quoteattr(str(loser))}/>' for winner, loser in utils.edges(graph)]
+        lines += ['  </graph>', '</graphml>']
+        handle.write("\n".join(lines) + "\n")
+
+    def write_edgelist(graph: tournament, handle, name: str):
+        '''
+            One "winner loser" line per edge (labels must not contain whitespace)
+        '''
+        handle.write("".join(f"{winner} {loser}\n" for winner, loser in utils.edges(graph)))
 
 if __name__ == "__main__":
     adjacency_matrix = [
@@ -29,5 +109,4 @@ if __name__ == "__main__":
         [0, 0, 0, 1, 0, 0, 0]
     ]
 
-    G = nx.DiGraph()
-    generate_graph(adjacency_matrix, G)
+    generate_graph(adjacency_matrix)
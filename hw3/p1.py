@@ -1,38 +1,38 @@
+import os
+import sys
 import copy 
-from tabulate import tabulate
-from fractions import Fraction
-from itertools import permutations, combinations
+from itertools import combinations, islice
+from math import comb, prod
+import numpy as np
+if __package__ in (None, ""):
+    # Started as "python p1.py" from hw3/ (see README.md), the voting package sits in the repository root
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from voting.profiles import anonymous_profile
 
 def generate_probability_matrix(profile, alternatives):
     '''
         This function generates the probability matrix
         It also creates a 'table' for visualization purposes and displays each entry as a fraction (probability of a candidate defeatig another)
+        The profile is either a list of ballots or an anonymous_profile, whose ballots are weighted by their multiplicity
     '''
-    # Initialize Q matrix with zeros
-    Q = [[0 for _ in range(len(alternatives.keys()))] for _ in range(len(alternatives.keys()))]
-    
-    # Create all pairs for alternatives this is useful for looping
-    pairs = list(combinations(alternatives.keys(),2))
-    
-    # Go over each ballot and compute position of candidate i with candidate j
-    # Based on which candidate has higher ranking, increase win count
-    for ballot in profile:
-        for pair in pairs:
-            i, j = pair[0], pair[1]
-            pos_i, pos_j = ballot.index(i), ballot.index(j) 
-            if pos_i < pos_j:
-                Q[alternatives[i]][alternatives[j]] = Q[alternatives[i]][alternatives[j]] + 1
-            else:
-                Q[alternatives[j]][alternatives[i]] = Q[alternatives[j]][alternatives[i]] + 1
-    
+    # Display only, loaded on first use so that importing the computations stays cheap
+    from tabulate import tabulate
+    from fractions import Fraction
+
+    # Alternatives in matrix order
+    order = sorted(alternatives.keys(), key=alternatives.get)
+    if not isinstance(profile, anonymous_profile):
+        profile = anonymous_profile.from_dict(dict(enumerate(profile)), tuple(order))
+
+    # Read pairwise win counts off the profile's majority matrix (counted once per profile)
+    majority = profile.majority_matrix.restrict(order)
+    num_voters = majority.NUM_VOTERS
+
     # For data storing purposes
-    data_Q = copy.deepcopy(Q)
+    data_Q = majority.probabilities().tolist()
 
     # For display purposes. Here show everything as a fraction
-    for i in range(len(Q)):
-        for j in range(len(Q[0])):
-            Q[i][j] = str(Fraction(Q[i][j],len(profile)))
-            data_Q[i][j] = data_Q[i][j] / len(profile)
+    Q = [[str(Fraction(int(count), num_voters)) for count in row] for row in majority.pairs]
 
     
     col_label = row_label = list(alternatives.keys())
@@ -41,60 +41,264 @@ def generate_probability_matrix(profile, alternatives):
     print(tabulate(data_Q, headers=[""] + col_label, tablefmt="grid"))
     return data_Q
 
-def compute_winning_probabilities(probability_matrix, alternatives):
+def compute_winning_probabilities(probability_matrix, alternatives, T = None):
     '''
-        This is the outer function to house the recursive 'do' function.
-        It allows us to initialize values inside of it while supplying them to the do function.
+        This computes (and displays) the probability of every candidate winning the knock out tournament T.
+        T is a nested list of lists, balanced or not, whose leaves are ['a'] or 'a' (defaults to the eight player bracket below).
+        The probabilities of all candidates come out of one bottom-up pass over the bracket (see knockout_probabilities).
     '''
-
-    def do(x, v, Q, candidates):
-        '''
-            This is the main recursive function which computes the probability of a candidate winning.
-        '''
-        # Base case
-        if isinstance(v, list) and len(v) == 1 and v[0] == x:
-            return 1
-        elif isinstance(v, list) and len(v) == 1:
-            return 0
-
-        # Recursion steps
-        l, r = v
-
-        # Check if candidate is in left descendants or right descendants
-        # This makes the left and right positioning relative to which candidate is being examined
-        # ex. if computing probabilities for 'a' then 'b' is the right candidate 
-        # ex. if computing probabilities for 'b' then 'a' is the right candidate (even though it is technically on the left in the tree)
-        if x in descendants(l):
-            g_x = do(x, l, Q, candidates) * sum(do(y, r, Q, candidates) * Q[candidates[x]][candidates[y]] for y in descendants(r))
-        else:
-            g_x = do(x, r, Q, candidates) * sum(do(y, l, Q, candidates) * Q[candidates[x]][candidates[y]] for y in descendants(l))
-
-        return g_x
-    
-    def descendants(v):
-        '''
-            This is a helper method for determining the descendants of a particular node.
-            If the node is a singleton, return that node else return the union of all the sub nodes. 
-        '''
-        # Base case: Return singleton / leaf
-        if len(v) == 1 and isinstance(v[0], str):
-            return {v[0]}
-        # Recursion steps: Return subtree recursively 
-        elif len(v) == 2:
-            return descendants(v[0]).union(descendants(v[1]))
-
     # Define knock out tournament as T (a nested list of lists)
-    T = [[[['a'],['b']],[['c'],['d']]],[[['e'],['f']],[['g'],['h']]]]
+    if T is None:
+        T = [[[['a'],['b']],[['c'],['d']]],[[['e'],['f']],[['g'],['h']]]]
     
     print("\n")
 
     # The rest is just for display purposes
-    result = {alternative : do(alternative, T, probability_matrix, alternatives) for alternative, _ in alternatives.items()}
+    result = knockout_probabilities(T, probability_matrix, alternatives)
     for alt, res in result.items():
         print(f"candidate {alt} has winning probability {res}")
     winner = [key for key, value in result.items() if value == max(result.values())].pop()
     print(f"\nTherefore the winning alternative is {winner} with probability {max(result.values())}\n")
+    return result
+
+def knockout_probabilities(bracket, probability_matrix, alternatives) -> dict:
+    '''
+        Return the probability of every candidate winning the knock out tournament given by bracket.
+    '''
+    Q = np.asarray(probability_matrix, dtype=float)
+    root = subtree_probabilities(bracket, Q, alternatives, {})
+    return {alternative: float(root[idx]) for alternative, idx in alternatives.items()}
+
+def subtree_probabilities(v, Q, candidates, memo):
+    '''
+        Return the vector of winning probabilities of node v, entry [x] is the probability that candidate x wins the subtree v.
+        Every node is computed once from its children and stored in memo (keyed by node), O(m^2) per node:
+            x from the left subtree wins v with probability p_l[x] * sum over y of p_r[y] * Q[x][y] (and symmetrically for the right).
+    '''
+    if id(v) in memo:
+        return memo[id(v)]
+
+    # Base case: a leaf is won by its only candidate
+    if isinstance(v, str) or len(v) == 1:
+        p = np.zeros(len(Q))
+        p[candidates[v if isinstance(v, str) else v[0]]] = 1.0
+    # Recursion steps: the two subtrees have disjoint candidates, so both terms can be added
+    else:
+        l, r = v
+        p_l = subtree_probabilities(l, Q, candidates, memo)
+        p_r = subtree_probabilities(r, Q, candidates, memo)
+        p = p_l * (Q @ p_r) + p_r * (Q @ p_l)
+
+    memo[id(v)] = p
+    return p
+
+def fix_tournament(probability_matrix, alternatives, target, restarts = 20, seed = None):
+    '''
+        Tournament fixing: find the seeding of a balanced knock out tournament (all alternatives, a power of two) that maximizes the winning probability of target.
+        Returns the bracket (nested list of lists) and the winning probability of target.
+        With target in the first leaf, it has to beat the winner of seeding[1:2], then of seeding[2:4], seeding[4:8], ...
+        so its winning probability is the product over rounds of sum over y of P(y wins that block) * Q[target][y].
+        A block's arrangement only changes its own factor, so the search is over which players go into which block:
+            - swap based local search with random restarts finds a good seeding first
+            - a branch and bound over the blocks (smallest first, the last block takes whoever is left) then proves it optimal or
+              improves it; every placed block is arranged at its best, and every open block is bounded by the largest
+              Q[target][y] left and by how much of the block each player left can win at most
+        The result is exact; all arrangements of the last block are tried, which keeps it practical up to 16 players.
+        Block probability vectors are memoized by block, so a swap only evaluates the (at most two) blocks it changes.
+    '''
+    Q = np.asarray(probability_matrix, dtype=float)
+    t = alternatives[target]
+    others = [idx for alternative, idx in alternatives.items() if alternative != target]
+    size = len(others) + 1
+    if size & (size - 1):
+        raise ValueError("tournament fixing needs a power of two number of players")
+    blocks = [(1 << r, 1 << (r+1)) for r in range(size.bit_length() - 1)]
+    memo = {}
+    # Relative margin for a better seeding, so rounding never counts as an improvement
+    tolerance = 1e-12
+
+    def block_value(block):
+        # Probability that target beats the winner of the block
+        return float(seeding_probabilities(block, Q, memo) @ Q[t])
+
+    def value(seeding):
+        return float(np.prod([block_value(seeding[a:b]) for a, b in blocks]))
 
+    rng = np.random.default_rng(seed)
+    block_of = [None] + [r for r, (a, b) in enumerate(blocks) for _ in range(a, b)]
+    best, best_value = (t,) + tuple(others), value((t,) + tuple(others))
+    for restart in range(restarts):
+        # First start puts the easiest opponents in the earliest rounds, the others are random
+        if restart == 0:
+            order = sorted(others, key=lambda y: -Q[t][y])
+        else:
+            order = list(rng.permutation(others))
+        seeding = [t] + order
+        values = [block_value(tuple(seeding[a:b])) for a, b in blocks]
+        improved = True
+        while improved:
+            improved = False
+            for i in range(1, size):
+                for j in range(i + 1, size):
+                    # Only the blocks of i and j change
+                    seeding[i], seeding[j] = seeding[j], seeding[i]
+                    changed = {block_of[i], block_of[j]}
+                    new = {r: block_value(tuple(seeding[blocks[r][0]:blocks[r][1]])) for r in changed}
+                    if np.prod([new.get(r, values[r]) for r in range(len(blocks))]) > np.prod(values) * (1 + tolerance):
+                        for r in changed:
+                            values[r] = new[r]
+                        improved = True
+                    else:
+                        seeding[i], seeding[j] = seeding[j], seeding[i]
+        if np.prod(values) > best_value * (1 + tolerance):
+            best, best_value = tuple(seeding), float(np.prod(values))
+
+    # Best arrangement of every block that has been placed and caps on block factors, by players, and the probability vectors of halves
+    arranged, caps, halves = {}, {}, {}
+    q_t, P = Q[t].tolist(), Q.tolist()
+
+    def best_arrangement(players):
+        if players not in arranged:
+            values = arrangement_probabilities(players, Q, halves) @ Q[t]
+            i = int(values.argmax())
+            arranged[players] = float(values[i]), utils.arrangement(players, i)
+        return arranged[players]
+
+    def block_bound(players, rounds):
+        # Cap on the factor of a block of 2^rounds players taken from players (sorted by decreasing Q[target][y]): y wins it
+        # with probability at most the product of its best pairwise probabilities against the others (one per round), the
+        # chances add up to one, and the weakest opponents of target get as much of it as their caps allow
+        if (players, rounds) not in caps:
+            bound, mass = 0.0, 1.0
+            for y in players:
+                share = min(prod(sorted((P[y][z] for z in players if z != y), reverse=True)[:rounds]), mass)
+                bound, mass = bound + share * q_t[y], mass - share
+                if mass <= 0:
+                    break
+            caps[players, rounds] = bound
+        return caps[players, rounds]
+
+    def search(r, remaining, product, seeding):
+        # remaining is sorted by decreasing Q[target][y], and so is every block taken from it
+        nonlocal best, best_value
+        # The open blocks are won by different players, so their factors are at most the largest values of Q[target][y] left
+        if product * prod(q_t[y] for y in remaining[:len(blocks) - r]) <= best_value * (1 + tolerance):
+            return
+        if product * prod(block_bound(remaining, k) for k in range(r, len(blocks))) <= best_value * (1 + tolerance):
+            return
+        if r == len(blocks) - 1:
+            block_best, block = best_arrangement(remaining)
+            if product * block_best > best_value * (1 + tolerance):
+                best, best_value = seeding + block, product * block_best
+            return
+        a, b = blocks[r]
+        for chosen in combinations(remaining, b - a):
+            block_best, block = best_arrangement(chosen)
+            search(r + 1, tuple(y for y in remaining if y not in chosen), product * block_best, seeding + block)
+
+    search(0, tuple(sorted(others, key=lambda y: -q_t[y])), 1.0, (t,))
+    return utils.seeding_to_bracket(best, alternatives), float(best_value)
+
+def simulate_knockout(probability_matrix, alternatives, T = None, trials = 1000000, batch_size = 1 << 20, seed = None, confidence = 0.95):
+    '''
+        Monte Carlo estimate of every candidate's winning probability in the knock out tournament T (same format as compute_winning_probabilities).
+        Brackets are played in batches: every match of the bracket is decided for the whole batch with one vectorized draw.
+        Returns {candidate: (win rate, lower, upper)} with Wilson score confidence bounds; a fixed seed makes the run reproducible.
+    '''
+    if T is None:
+        T = [[[['a'],['b']],[['c'],['d']]],[[['e'],['f']],[['g'],['h']]]]
+    Q = np.asarray(probability_matrix, dtype=float)
+    rng = np.random.default_rng(seed)
+
+    def play(v, n):
+        # Winner of subtree v in each of the n simulated brackets
+        if isinstance(v, str) or len(v) == 1:
+            return np.full(n, alternatives[v if isinstance(v, str) else v[0]], dtype=np.intp)
+        l, r = v
+        x, y = play(l, n), play(r, n)
+        return np.where(rng.random(n) < Q[x, y], x, y)
+
+    wins = np.zeros(len(Q), dtype=np.int64)
+    for start in range(0, trials, batch_size):
+        wins += np.bincount(play(T, min(batch_size, trials - start)), minlength=len(Q))
+
+    from statistics import NormalDist
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    rate = wins / trials
+    center = (rate + z**2 / (2 * trials)) / (1 + z**2 / trials)
+    spread = z * np.sqrt(rate * (1 - rate) / trials + z**2 / (4 * trials**2)) / (1 + z**2 / trials)
+    return {alternative: (float(rate[idx]), float(center[idx] - spread[idx]), float(center[idx] + spread[idx])) for alternative, idx in alternatives.items()}
+
+def arrangement_probabilities(players, Q, memo):
+    '''
+        Winning probability vectors of every balanced bracket over players, one row per seeding in the order of utils.arrangement.
+        Rows are built from the rows of the two halves, which are memoized by players.
+    '''
+    if len(players) == 1:
+        p = np.zeros((1, len(Q)))
+        p[0, players[0]] = 1.0
+        return p
+    first, rest = players[0], players[1:]
+    stacked = []
+    for partners in combinations(rest, len(players)//2 - 1):
+        left, right = (first,) + partners, tuple(y for y in rest if y not in partners)
+        for half in (left, right):
+            if half not in memo:
+                memo[half] = arrangement_probabilities(half, Q, memo)
+        # Every arrangement of the left half against every arrangement of the right half
+        p_l, p_r = np.repeat(memo[left], len(memo[right]), axis=0), np.tile(memo[right], (len(memo[left]), 1))
+        stacked.append(p_l * (p_r @ Q.T) + p_r * (p_l @ Q.T))
+    return np.vstack(stacked)
+
+def seeding_probabilities(seeding, Q, memo):
+    '''
+        Winning probability vector of the balanced bracket over seeding (a tuple of candidate indices), memoized by seeding.
+    '''
+    if seeding in memo:
+        return memo[seeding]
+    if len(seeding) == 1:
+        p = np.zeros(len(Q))
+        p[seeding[0]] = 1.0
+    else:
+        p_l = seeding_probabilities(seeding[:len(seeding)//2], Q, memo)
+        p_r = seeding_probabilities(seeding[len(seeding)//2:], Q, memo)
+        p = p_l * (Q @ p_r) + p_r * (Q @ p_l)
+    memo[seeding] = p
+    return p
+
+class utils:
+    '''
+        Helpers for knock out tournaments
+    '''
+
+    def arrangement(players, index):
+        '''
+            Seeding number index of the balanced brackets over players (a tuple of candidate indices, a power of two of them), counted
+            as in arrangement_probabilities: the partners of the first player in combinations order, then the left half's seeding,
+            then the right half's; brackets that only swap the two halves of a match are counted once
+        '''
+        if len(players) == 1:
+            return players
+        first, rest = players[0], players[1:]
+        half = utils.count_arrangements(len(players) // 2)
+        partners = next(islice(combinations(rest, len(players)//2 - 1), index // half**2, None))
+        right = tuple(y for y in rest if y not in partners)
+        return utils.arrangement((first,) + partners, index % half**2 // half) + utils.arrangement(right, index % half)
+
+    def count_arrangements(size):
+        '''
+            Number of balanced brackets over size players, up to swapping the halves of a match
+        '''
+        return 1 if size == 1 else comb(size - 1, size//2 - 1) * utils.count_arrangements(size // 2)**2
+
+    def seeding_to_bracket(seeding, alternatives):
+        '''
+            Turn a seeding (candidate indices in leaf order) into a nested list of lists bracket
+        '''
+        names = {idx: alternative for alternative, idx in alternatives.items()}
+        if len(seeding) == 1:
+            return [names[seeding[0]]]
+        return [utils.seeding_to_bracket(seeding[:len(seeding)//2], alternatives), utils.seeding_to_bracket(seeding[len(seeding)//2:], alternatives)]
 
 
 if __name__ == "__main__":
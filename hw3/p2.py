@@ -1,6 +1,14 @@
+import os
+import sys
 import itertools
 import string
 import copy 
+import numpy as np
+if __package__ in (None, ""):
+    # Started as "python p2.py" from hw3/ (see README.md), the voting package sits in the repository root
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from voting.profiles import anonymous_profile, majority_matrix
+
 class voting_rules:
 
     def __init__(self, profile: dict, alternatives: tuple):
@@ -10,43 +18,121 @@ class voting_rules:
         self.profile = profile
         self.NUM_VOTERS = len(self.profile.keys())
         self.alternatives = alternatives
+        self.weighted_profile = anonymous_profile.from_dict(self.profile, self.alternatives)
     
     def copeland_winner(self):
         '''
             This implements Copeland's voting rule 
         '''
-        # Same as in condorcet_winner, initialize all pair dictionary
-        all_pairs = {pair: 0 for pair in itertools.combinations(self.alternatives, 2)}
+        # Tally of the current profile, every fifth ballot is applied and retracted as a delta
+        tally = what_if_tally(self.weighted_profile)
 
         fifth_ballot = itertools.permutations(self.alternatives, len(self.alternatives))
         # fifth_ballot =[('b','a','c','d','e'),('a','b','c','d','e')]
 
-        # Same as condorcet_winner
         for b5 in fifth_ballot:
             
-            # Add fifth profile
-            self.profile.update({"v5": list(b5)})
-            # Same as in condorcet_winner, initialize all pair dictionary
-            all_pairs = {pair: 0 for pair in itertools.combinations(self.alternatives, 2)}
-            
-            for _, preference in self.profile.items():
-                all_pairs = utils.get_pairwise_score(all_pairs, preference)
-
-            initial = {self.alternatives[i]: i for i in range(len(self.alternatives))}
-
-            # Get a score matrix based on all pairs
-            matrix = utils.generate_matrix(all_pairs, set(self.alternatives), initial, self.NUM_VOTERS)
-            # Tally candidates by row, tally candidates by column
-            row_agg, col_agg = utils.aggregate_matrix(matrix)
+            # Add fifth ballot on top of the existing pairwise counts
+            tally.apply(b5)
 
-            # Create a score dictionary that stores the difference between row aggregate - column aggregate (Copeland's defining feature) for each alternative
-            diff = dict(map(lambda x, y, z: (z, x - y), row_agg, col_agg, self.alternatives))
+            # Create a score dictionary that stores the difference between wins - losses (Copeland's defining feature) for each alternative
+            diff = dict(zip(self.alternatives, tally.copeland_scores().tolist()))
+            tally.retract(b5)
 
             # Return maximal element
             yield utils.select_winner(diff)
+
+    def possible_copeland_winners(self, num_added: int = 1, tie_score: float = 0.5) -> set:
+        '''
+            Return the candidates that can become (co-)winners under Copeland once num_added more voters cast a ballot
+            This reasons over which pairwise margins of the current profile the new voters can move instead of trying every extra ballot
+                - a candidate c does best by being ranked first on every new ballot
+                - num_added = 1: the rest of the ballot is filled greedily from the top, placing any candidate that stays at or below c's score
+                  even when it beats everybody still unplaced (exact for a single voter, O(m^3))
+                - num_added > 1: identical greedy ballots prove a yes, a candidate that beats c's score even when ranked last everywhere
+                  proves a no, and only the remaining cases fall back to a pruned search over the new ballots
+        '''
+        margins = self.weighted_profile.majority_matrix.margins()
+        winners = set()
+        for c in range(len(self.alternatives)):
+            if utils.greedy_ballot(margins, c, num_added, tie_score) is not None:
+                winners.add(self.alternatives[c])
+            elif num_added > 1 and utils.search_ballots(margins, c, num_added, tie_score):
+                winners.add(self.alternatives[c])
+        return winners
     
     
     
+class what_if_tally:
+    '''
+        Precomputed tally of a profile (Borda score vector and pairwise count matrix) for "add one ballot" what-if queries
+        Applying or retracting a ballot is an O(m) delta on the Borda scores and an O(m^2) delta on the pairwise counts,
+        so a sweep over many hypothetical ballots costs only the deltas instead of a recount of the profile per ballot
+    '''
+
+    def __init__(self, profile: anonymous_profile):
+        '''
+            Initialize class
+        '''
+        self.alternatives = profile.alternatives
+        self.position = {self.alternatives[i]: i for i in range(len(self.alternatives))}
+        self.NUM_VOTERS = profile.NUM_VOTERS
+        self.borda = (len(self.alternatives) - 1) * profile.NUM_VOTERS - profile.counts @ profile.ranks
+        self.pairs = profile.majority_matrix.pairs.copy()
+
+    def ranks_of(self, ballot) -> np.ndarray:
+        '''
+            Position of every alternative on the ballot (a sequence of alternative names)
+        '''
+        ranks = np.empty(len(self.alternatives), dtype=np.int64)
+        ranks[[self.position[alternative] for alternative in ballot]] = np.arange(len(ballot))
+        return ranks
+
+    def apply(self, ballot, multiplicity: int = 1):
+        '''
+            Add multiplicity voters casting ballot
+        '''
+        ranks = self.ranks_of(ballot)
+        self.borda += multiplicity * (len(self.alternatives) - 1 - ranks)
+        self.pairs += multiplicity * (ranks[:, None] < ranks[None, :])
+        self.NUM_VOTERS += multiplicity
+
+    def retract(self, ballot, multiplicity: int = 1):
+        '''
+            Remove multiplicity voters casting ballot
+        '''
+        self.apply(ballot, -multiplicity)
+
+    def borda_winners(self) -> set:
+        '''
+            Alternatives with the highest Borda score
+        '''
+        return {self.alternatives[i] for i in np.flatnonzero(self.borda == self.borda.max())}
+
+    def copeland_scores(self, tie_score: float = 0.5) -> np.ndarray:
+        '''
+            Copeland scores of the current tally
+        '''
+        return majority_matrix(self.pairs, self.alternatives, self.NUM_VOTERS).copeland_scores(tie_score)
+
+    def copeland_winners(self, tie_score: float = 0.5) -> set:
+        '''
+            Alternatives with the highest Copeland score
+        '''
+        score = self.copeland_scores(tie_score)
+        return {self.alternatives[i] for i in np.flatnonzero(score == score.max())}
+
+    def sweep(self, ballots, rule: str = "borda"):
+        '''
+            For every hypothetical ballot yield the winners ("borda" or "copeland") with that one ballot added to the profile
+        '''
+        winners = self.borda_winners if rule == "borda" else self.copeland_winners
+        for ballot in ballots:
+            self.apply(ballot)
+            result = winners()
+            self.retract(ballot)
+            yield result
+
 class utils:
     '''
         This is just a helper class for doing incredibly inefficient things
@@ -57,18 +143,101 @@ class utils:
         '''
         return {key for key in counts if counts.get(key) == max(counts.values())}.pop()
     
-    def get_pairwise_score(pairs: dict, preference: list) -> dict:
+    def copeland_score(margin_row: np.ndarray, tie_score: float) -> float:
         '''
-            Determine pair wise winner, then update score to get aggregate pair wise wins
+            Copeland score read off a row of (new) margins that excludes the candidate itself
         '''
-        for pair, _ in pairs.items():
-            if (preference.index(pair[0]) > preference.index(pair[1])):
-                offset = 0
+        return np.count_nonzero(margin_row > 0) + tie_score * np.count_nonzero(margin_row == 0)
+
+    def greedy_ballot(margins: np.ndarray, c: int, num_added: int, tie_score: float) -> list:
+        '''
+            Build a ballot with c on top such that num_added copies of it make c a Copeland (co-)winner, None if the greedy gets stuck
+            A candidate's score only depends on who is ranked below it, and only grows with that set, so any candidate whose score
+            with every unplaced candidate below it is no more than c's can safely take the next position
+        '''
+        others = [d for d in range(len(margins)) if d != c]
+        target = utils.copeland_score(margins[c, others] + num_added, tie_score)
+        ballot, unplaced = [c], set(others)
+        while unplaced:
+            for d in sorted(unplaced):
+                opponents = [e for e in range(len(margins)) if e != d]
+                below = np.array([e in unplaced for e in opponents])
+                if utils.copeland_score(margins[d, opponents] + num_added * np.where(below, 1, -1), tie_score) <= target:
+                    ballot.append(d)
+                    unplaced.remove(d)
+                    break
             else:
-                offset = 1
-            pairs[pair] = pairs[pair] + offset 
-        return pairs
-    
+                return None
+        return ballot
+
+    def search_ballots(margins: np.ndarray, c: int, num_added: int, tie_score: float) -> bool:
+        '''
+            Pruned search for num_added ballots (c on top of each) that make c a Copeland (co-)winner
+            Ballots are built one position at a time and a placed candidate is ranked above everyone still unplaced, so every pair
+            is settled as soon as one side of it is placed; a branch is cut as soon as some candidate's score exceeds c's even if
+            every comparison that is still open goes against it
+            Failed states are memoized on (margins, placed candidates, ballots left). A margin only matters up to the number of
+            votes that can still move it, so margins are clipped to that range first; this also merges the orders in which the
+            same set of ballots is added, since the ballots are interchangeable
+        '''
+        m = len(margins)
+        others = [d for d in range(m) if d != c]
+        target = utils.copeland_score(margins[c, others] + num_added, tie_score)
+        off_diagonal = ~np.eye(m, dtype=bool)
+        failed = set()
+
+        def flexibility(unplaced, remaining):
+            # Votes that can still move each pair: one per ballot left, plus one while both sides are unplaced on the open ballot
+            return remaining + (unplaced[:, None] & unplaced[None, :])
+
+        def hopeless(current, unplaced, remaining):
+            worst = current - flexibility(unplaced, remaining)
+            # least[d][e] is the fewest points d can still take from its contest with e
+            least = np.where(worst > 0, 1, np.where(worst == 0, tie_score, 0)) * off_diagonal
+            score = least.sum(axis=1)
+            if (score[others] > target).any():
+                return True
+            # Counting: the s highest of the others score at least what they surely take from outside the group, plus
+            # min(1, 2 tie_score) for every game inside it, and all of them have to stay at or below target
+            order = [others[i] for i in np.argsort(-score[others], kind="stable")]
+            inner = least[np.ix_(order, order)]
+            games = np.triu(np.maximum(inner + inner.T, min(1, 2 * tie_score)), 1).sum(axis=0).cumsum()
+            taken = least[order].sum(axis=1).cumsum() - np.tril(inner).sum(axis=1).cumsum() - np.triu(inner, 1).sum(axis=0).cumsum()
+            return (taken + games > target * np.arange(1, len(order) + 1)).any()
+
+        def place(current, unplaced, d):
+            # d goes above everyone still unplaced
+            current = current.copy()
+            current[d, unplaced] += 1
+            current[unplaced, d] -= 1
+            unplaced = unplaced.copy()
+            unplaced[d] = False
+            return current, unplaced
+
+        def extend(current, unplaced, remaining):
+            if hopeless(current, unplaced, remaining):
+                return False
+            if not unplaced.any():
+                if remaining == 0:
+                    return True
+                # Start the next ballot with c on top
+                current, unplaced = place(current, ~np.zeros(m, dtype=bool), c)
+                remaining -= 1
+            bound = flexibility(unplaced, remaining) + 1
+            key = (np.clip(current, -bound, bound).tobytes(), unplaced.tobytes(), remaining)
+            if key in failed:
+                return False
+            # Candidates that can score the least go first, pushing the dangerous ones down the ballot
+            unplaced_ids = np.flatnonzero(unplaced)
+            for d in unplaced_ids[np.argsort((current[unplaced_ids] > 0).sum(axis=1), kind="stable")]:
+                if extend(*place(current, unplaced, d), remaining):
+                    return True
+            failed.add(key)
+            return False
+
+        current, unplaced = place(margins, ~np.zeros(m, dtype=bool), c)
+        return extend(current, unplaced, num_added - 1)
+
     def map_alternative_to_score(preference: list, score: dict) -> dict:
         '''
             Take each alternative, and update score dictionary with its weight by Borda rule
@@ -76,36 +245,6 @@ class utils:
         for alternative, _ in score.items():
             score[alternative] = score[alternative] + ((len(preference) - 1) - preference.index(alternative))
         return score
-    
-    def generate_matrix(pairs: dict, lowest: set, position: dict, num_voters: int) -> list:
-        '''
-            Generate an NxN matrix of 1's and 0's where each position checks if the score beat majority 
-            If majority was achieved, 1 else 0 (this takes care of the reverse pair as well)
-        '''
-        matrix = [[0 for _ in range(len(lowest))] for _ in range(len(lowest))]
-        for pair, score in pairs.items():
-            if score >= int(num_voters/2) + 1:
-                matrix[position.get(pair[0])][position.get(pair[1])], matrix[position.get(pair[1])][position.get(pair[0])] = 1, 0
-            else:
-                matrix[position.get(pair[0])][position.get(pair[1])], matrix[position.get(pair[1])][position.get(pair[0])] = 0, 1
-        return matrix 
-    
-    def aggregate_matrix(matrix: list) -> list:
-        '''
-            Matrix aggregator (row wise and col wise) but unfortunately this is only for an N x N matrix
-        '''
-        row_tally = []
-        for row in range(len(matrix[0])):
-            row_tally.append(sum(matrix[row]))
-        
-        col_tally = []
-        for row in range(len(matrix)):
-            total = 0
-            for col in range(len(matrix)):
-                total += matrix[col][row]
-            col_tally.append(total)
-
-        return row_tally, col_tally
 
 if __name__ == "__main__":
     # Voting Profile from problem 2
@@ -121,7 +260,7 @@ if __name__ == "__main__":
     load_rule = voting_rules(P_2, A_2)
 
     # Storing as a set to ensure uniqueness
-    copeland_winner = set(load_rule.copeland_winner())
+    copeland_winner = load_rule.possible_copeland_winners()
     print(f"Not possible Copeland winners: {set(A_2).difference(copeland_winner)}")
     print(f"Possible Copeland winners: {copeland_winner}")
 
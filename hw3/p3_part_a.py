@@ -1,6 +1,12 @@
+import os
+import sys
 import itertools
 import string
-import copy 
+import numpy as np
+if __package__ in (None, ""):
+    # Started as "python p3_part_a.py" from hw3/ (see README.md), the voting package sits in the repository root
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from voting.profiles import anonymous_profile
 class voting_rules:
 
     def __init__(self, profile: dict, alternatives: tuple):
@@ -10,33 +16,49 @@ class voting_rules:
         self.profile = profile
         self.NUM_VOTERS = len(self.profile.keys())
         self.alternatives = alternatives
+        self.weighted_profile = anonymous_profile.from_voters(self.profile, self.alternatives)
     
     def borda_count(self):
         '''
-            This implements the Borda count rule
+            This implements the Borda count rule, first for the whole profile and then with each voter left out in turn
+            The full Borda vector is computed once and each voter's contribution is subtracted from it, O(n*m) overall
         '''
-        all_possible_winners = []
-        # Initialize score dictionary for total profile (this is before any changes are made to the profile)
-        unaltered_score = {alternative : 0 for alternative in self.alternatives}
-        # Iterate over each voter, ballot pair
-        for _, preference in self.profile.items():
-            # Use (n-1, n-2, ...., 0) as the weight vector (computed based on length of preference), update score dictionary based on preference ordering
-            unaltered_score = utils.map_alternative_to_score(preference, unaltered_score)
-        unaltered_winner = utils.select_winner(unaltered_score)
-        all_possible_winners.append(unaltered_winner)
-        mutable_profile = copy.deepcopy(self.profile)
-        for voter, true_preference in self.profile.items():
-            mutable_profile.pop(voter)
-            altered_score = {alternative : 0 for alternative in self.alternatives}
-            for _, preference in mutable_profile.items():
-                # Use (n-1, n-2, ...., 0) as the weight vector (computed based on length of preference), update score dictionary based on preference ordering
-                altered_score = utils.map_alternative_to_score(preference, altered_score)
-            altered_winner = utils.select_winner(altered_score)
-            all_possible_winners.append(altered_winner)
-            mutable_profile.update({voter: true_preference})
+        # Each voter gives (m-1) - position to each alternative
+        contributions = (len(self.alternatives) - 1) - self.weighted_profile.ranks.astype(np.int64)
+        unaltered_score = contributions.sum(axis=0)
+        all_possible_winners = [utils.select_winner(dict(zip(self.alternatives, unaltered_score.tolist())))]
+        # Row v is the Borda vector of the profile without voter v
+        for altered_score in (unaltered_score - contributions).tolist():
+            all_possible_winners.append(utils.select_winner(dict(zip(self.alternatives, altered_score))))
         # Return maximal candidate (highest count here corresponds to highest Borda count)
         return all_possible_winners
 
+    def coalition_removals(self, k: int = 5) -> dict:
+        '''
+            For every alternative, return a smallest coalition of at most k voters whose removal makes it a Borda (co-)winner (None if there is none)
+            Removing voter v lowers the lead of d over the target c by rank_v(c) - rank_v(d), and every lead has to end up at or below zero
+            Voters with the same gains are merged, and the search is cut as soon as the remaining slots cannot close some lead
+        '''
+        voters = list(self.profile.keys())
+        ranks = self.weighted_profile.ranks.astype(np.int64)
+        score = ((len(self.alternatives) - 1) - ranks).sum(axis=0)
+        removals = {}
+        for c, target in enumerate(self.alternatives):
+            if score[c] == score.max():
+                removals[target] = []
+                continue
+            others = [d for d in range(len(self.alternatives)) if d != c]
+            gains, inverse = np.unique(ranks[:, [c]] - ranks[:, others], axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            coalition = utils.smallest_cover(gains, np.bincount(inverse), score[others] - score[c], k)
+            if coalition is None:
+                removals[target] = None
+            else:
+                # Map every chosen gain vector back to distinct voters casting it
+                members = [np.flatnonzero(inverse == row) for row in sorted(set(coalition))]
+                removals[target] = [voters[v] for row, idx in zip(sorted(set(coalition)), members) for v in idx[:coalition.count(row)]]
+        return removals
+
 class utils:
     '''
         This is just a helper class for doing incredibly inefficient things
@@ -46,15 +68,54 @@ class utils:
             Return maximal voted candidate
         '''
         return {key for key in counts if counts.get(key) == max(counts.values())}.pop()
-    
-    def map_alternative_to_score(preference: list, score: dict) -> dict:
+
+    def smallest_cover(gains: np.ndarray, counts: np.ndarray, deficits: np.ndarray, k: int) -> list:
         '''
-            Take each alternative, and update score dictionary with its weight by Borda rule
+            Smallest multiset of at most k rows of gains (row r used at most counts[r] times) whose column sums reach deficits
+            Iterative deepening over the size, rows are tried from the most useful down and a branch is cut when the remaining
+            slots cannot close some column's deficit, or the total deficit of the open columns (each row adds at most its
+            positive gains on them); the last row is picked by one vectorized scan instead of a loop
+            Rows without any positive gain never help and are left out
         '''
-        for alternative, _ in score.items():
-            score[alternative] = score[alternative] + ((len(preference) - 1) - preference.index(alternative))
-        return score
-    
+        useful = np.minimum(gains, deficits).clip(min=0).sum(axis=1)
+        order = np.argsort(-useful, kind="stable")
+        order = order[(gains[order] > 0).any(axis=1)]
+        gains, counts = gains[order], counts[order]
+        positive = gains.clip(min=0)
+        # best[i][d] is the largest gain for column d among rows i, i+1, ...
+        best = np.full((len(order) + 1, len(deficits)), -np.inf)
+        best[:-1] = np.maximum.accumulate(gains[::-1], axis=0)[::-1]
+
+        def search(start, remaining, slots, chosen):
+            if (remaining <= 0).all():
+                return chosen
+            # Stopping early is allowed, so the most the remaining slots can add to a column is max(0, slots * best gain)
+            if slots == 0 or start >= len(order) or (np.maximum(slots * best[start], 0) < remaining).any():
+                return None
+            open_columns = remaining > 0
+            if slots * positive[start:, open_columns].sum(axis=1).max() < remaining[open_columns].sum():
+                return None
+            if slots == 1:
+                fits = (gains[start:] >= remaining).all(axis=1)
+                fits[0] &= chosen.count(start) < counts[start]
+                hit = np.flatnonzero(fits)
+                return chosen + [start + int(hit[0])] if len(hit) else None
+            for i in range(start, len(order)):
+                if (np.maximum(slots * best[i], 0) < remaining).any():
+                    return None
+                used = chosen.count(i)
+                if used < counts[i]:
+                    found = search(i, remaining - gains[i], slots - 1, chosen + [i])
+                    if found is not None:
+                        return found
+            return None
+
+        for size in range(1, k + 1):
+            found = search(0, deficits, size, [])
+            if found is not None:
+                return [int(order[i]) for i in found]
+        return None
+
 if __name__ == "__main__":
  # Voting Profile from problem 3(a)
 
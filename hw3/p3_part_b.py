@@ -1,6 +1,11 @@
-import itertools
+import os
+import sys
 import string
-import copy 
+import numpy as np
+if __package__ in (None, ""):
+    # Started as "python p3_part_b.py" from hw3/ (see README.md), the voting package sits in the repository root
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from voting.profiles import anonymous_profile, tournament
 
 class modified_copeland:
     '''
@@ -15,80 +20,57 @@ class modified_copeland:
         self.NUM_VOTERS = len(self.profile.keys())
         self.alternatives = alternatives
         self.candidate_positions = {self.alternatives[i]: i for i in range(len(self.alternatives))}
+        self.weighted_profile = anonymous_profile.from_dict(self.profile, self.alternatives)
         self.matrix = []
+        self.tournament = None
     
     def _generate_copeland_matrix(self) -> str:
         '''
             This will make the win loss matrix given the alternatives and pairwise scores
         '''
-        # Same as in condorcet_winner, initialize all pair dictionary
-        all_pairs = {pair: 0 for pair in itertools.combinations(self.alternatives, 2)}
-
-        # Apply pairwise scores to the score dictionary for each pair
-        for _, preference in self.profile.items():
-            all_pairs = utils.get_pairwise_score(all_pairs, preference)
-
-        # Get a score matrix based on all pairs
-        return utils.generate_win_loss_matrix(all_pairs, set(self.alternatives), self.candidate_positions, self.NUM_VOTERS)
+        # Read the win loss matrix off the profile's majority matrix
+        majority = self.weighted_profile.majority_matrix
+        # A tied pair is awarded to the later alternative (same as the original pair loop)
+        ties = np.triu(majority.pairs == majority.pairs.T, 1).T
+        return (majority.wins() | ties).astype(int).tolist()
     
-    def _determine_winner(self, matrix, alternatives):
+    def _generate_copeland_tournament(self) -> tournament:
         '''
-            Helper for computing winner in case of Copeland voting rule
+            The win loss matrix as a bitset tournament, deleting or adding candidates only changes its present mask
         '''
-        # Tally candidates by row, tally candidates by column
-        
-        row_agg, col_agg = utils.get_row_col_scores(matrix)
+        self.matrix = self._generate_copeland_matrix()
+        self.tournament = tournament.from_matrix(self.matrix, self.alternatives)
+        return self.tournament
 
-        # Create a score dictionary that stores the difference between row aggregate - column aggregate (Copeland's defining feature) for each alternative
-        diff = dict(map(lambda x, y, z: (z, x - y), row_agg, col_agg, alternatives))
-        # print(diff)
-        # Return maximal element
-        return utils.select_winner(diff)
-    
     def constructive_control_copeland_winner(self):
         '''
-            This method iterates through each alternative and returns all the possible removals (at most 2) required to make a candidate a Copeland winner 
+            This method iterates through each alternative and returns the minimum number of removals required to make a candidate the unique Copeland winner
         '''
-        # Generate matrix without deletions
-        self.matrix = self._generate_copeland_matrix()
-
-        # Get scores without deletions 
-        raw_winners = self._determine_winner(self.matrix, self.alternatives)
-
-        num_required_removals_to_win = {a: 0 for a in self.alternatives}
-
-        # Each iteration represents target candidate to be made unique winner
-        for target, idx in self.candidate_positions.items():
-            # print(f"----------------{target}----------------")
-            mutable_matrix = {i:{j: elem for j, elem in enumerate(row)} for i, row in enumerate(self.matrix)}
-            target_outcome = mutable_matrix[idx]
-            dominant = [k for k,v in target_outcome.items() if v == 0]
-            # # Remove target to avoid comparing with itself
-            dominant.remove(idx)
-            dominion = [k for k,v in target_outcome.items() if v == 1]
-            corresponding_candidates = [k for k,v in self.candidate_positions.items() if v in dominant]
-            mutable_alternatives = list(copy.deepcopy(self.alternatives))
-            num_removals = 0
-            for winner in dominant:
-                _ = {k for k,v in self.candidate_positions.items() if v == winner}.pop()
-                # Remove row
-                mutable_matrix.pop(winner)
-                num_removals += 1
-                # Remove column
-                for k,v in mutable_matrix.items():
-                    v.pop(winner)
-                usable_matrix = [list(v.values()) for k, v in mutable_matrix.items()]
-                mutable_alternatives.remove(_)
-                new_raw_winners = self._determine_winner(usable_matrix, mutable_alternatives)
-                # print(new_raw_winners)
-                if target in new_raw_winners and len(new_raw_winners) == 1:
-                    num_required_removals_to_win.update({target:num_removals})
-        return num_required_removals_to_win
-            
+        return {target: len(removals) for target, removals in self.minimum_deletions().items()}
 
+    def minimum_deletions(self) -> dict:
+        '''
+            For every alternative, a smallest set of other alternatives whose deletion makes it the unique Copeland winner
+            Deleting everybody else always works, so every target gets an answer (see utils.minimum_deletion)
+        '''
+        graph = self._generate_copeland_tournament()
+        return {target: [self.alternatives[d] for d in utils.minimum_deletion(graph, idx)] for target, idx in self.candidate_positions.items()}
 
+    def minimum_additions(self, registered: tuple) -> dict:
+        '''
+            For every registered alternative, a smallest set of spoilers (the alternatives that are not registered) whose addition
+            makes it the unique Copeland winner among the registered alternatives and the spoilers added (None if no set works)
+        '''
+        graph = self._generate_copeland_tournament()
+        # Only the registered alternatives are present, the others form the spoiler pool
+        pool = graph.present & ~graph.mask(registered)
+        graph = graph.restrict(registered)
+        additions = {}
+        for target in registered:
+            added = utils.minimum_addition(graph, self.candidate_positions[target], pool)
+            additions[target] = None if added is None else [self.alternatives[x] for x in added]
+        return additions
 
-    
 class utils:
     '''
         This is just a helper class for doing incredibly inefficient things
@@ -99,47 +81,121 @@ class utils:
         '''
         return {key for key in counts if counts.get(key) == max(counts.values())}
     
-    def get_pairwise_score(pairs: dict, preference: list) -> dict:
+    def violations(graph: tournament, target: int, present: int) -> list:
         '''
-            Determine pair wise winner, then update score to get aggregate pair wise wins
+            (excess, candidate) for every present candidate whose Copeland score is not below target's among the present ones
+            In a win loss matrix over the present candidates the score (wins - losses) is 2 * wins - (size - 1), so comparing wins is enough;
+            excess is how many wins the candidate has to lose relative to target before target is strictly ahead
         '''
-        for pair, _ in pairs.items():
-            if (preference.index(pair[0]) > preference.index(pair[1])):
-                offset = 0
-            else:
-                offset = 1
-            pairs[pair] = pairs[pair] + offset 
-        return pairs
-    
-    def generate_win_loss_matrix(pairs: dict, lowest: set, position: dict, num_voters: int) -> list:
+        target_wins = (graph.beats[target] & present).bit_count()
+        found = []
+        for r in graph.members(present & ~(1 << target)):
+            wins = (graph.beats[r] & present).bit_count()
+            if wins >= target_wins:
+                found.append((wins - target_wins + 1, r))
+        return found
+
+    def minimum_deletion(graph: tournament, target: int) -> list:
         '''
-            Generate an NxN matrix of 1's and 0's where each position checks if the score beat majority 
-            If majority was achieved, 1 else 0 (this takes care of the reverse pair as well)
+            Smallest set of present candidates of graph (never target) whose deletion makes target the unique Copeland winner
+            Iterative deepening branch and bound over bitset states (present, kept), where kept candidates may no longer be deleted:
+                - deleting x only closes the gap between target and a rival r when r beats x and target does not (or x is r itself)
+                - a free rival is either deleted or kept, and a rival whose excess is more than the budget has to be deleted
+                - once every rival is kept, a candidate that closes the gap of the tightest kept rival is either deleted or kept
+                - a state that failed with some budget fails with any smaller one, failures are memoized across the deepening
         '''
-        matrix = [[0 for _ in range(len(lowest))] for _ in range(len(lowest))]
-        for pair, score in pairs.items():
-            if score >= int(num_voters/2) + 1:
-                matrix[position.get(pair[0])][position.get(pair[1])], matrix[position.get(pair[1])][position.get(pair[0])] = 1, 0
+        beats = graph.beats
+        failed = {}
+
+        def search(present, kept, budget):
+            rivals = utils.violations(graph, target, present)
+            if not rivals:
+                return []
+            if budget == 0 or failed.get((present, kept), -1) >= budget:
+                return None
+            # How many candidates that can still be deleted would close the gap of each kept rival
+            closing = {r: beats[r] & ~beats[target] & present & ~kept for excess, r in rivals if kept >> r & 1}
+            if any(excess > min(budget, closing[r].bit_count()) for excess, r in rivals if r in closing) or \
+               utils.deletion_bound(graph, target, present, kept, rivals, budget) > budget:
+                failed[(present, kept)] = budget
+                return None
+            free = [(excess, r) for excess, r in rivals if r not in closing]
+            forced = [r for excess, r in free if excess > budget]
+            if forced:
+                found = search(present & ~graph.mask(graph.alternatives[r] for r in forced), kept, budget - len(forced)) if len(forced) <= budget else None
+                if found is None:
+                    failed[(present, kept)] = budget
+                    return None
+                return forced + found
+            if free:
+                x = max(free)[1]
             else:
-                matrix[position.get(pair[0])][position.get(pair[1])], matrix[position.get(pair[1])][position.get(pair[0])] = 0, 1
-        return matrix 
-    
-    def get_row_col_scores(matrix: list) -> list:
-        '''
-            Matrix aggregator (row wise and col wise) but unfortunately this is only for an N x N matrix
-        '''
-        row_tally = []
-        for row in range(len(matrix[0])):
-            row_tally.append(sum(matrix[row]))
-        
-        col_tally = []
-        for row in range(len(matrix)):
-            total = 0
-            for col in range(len(matrix)):
-                total += matrix[col][row]
-            col_tally.append(total)
-
-        return row_tally, col_tally
+                # Strongest candidate closing the gap of the kept rival with the fewest such candidates
+                options = min(closing.values(), key=int.bit_count)
+                x = max(graph.members(options), key=lambda x: (beats[x] & present).bit_count())
+            found = search(present & ~(1 << x), kept, budget - 1)
+            if found is not None:
+                return [x] + found
+            found = search(present, kept | (1 << x), budget)
+            if found is None:
+                failed[(present, kept)] = budget
+            return found
+
+        for budget in range(graph.present.bit_count()):
+            found = search(graph.present, 0, budget)
+            if found is not None:
+                return sorted(found)
+
+    def deletion_bound(graph: tournament, target: int, present: int, kept: int, rivals: list, budget: int) -> int:
+        '''
+            Lower bound on the deletions still needed (budget + 1 when no budget is enough)
+            Only deleting candidates that beat target closes gaps: with q of those deleted, a kept rival needs excess <= q, and a free
+            rival with excess above q has to be deleted itself, which for a rival beating target is one of the q and otherwise one more
+            Counting gives a second bound: s candidates play s(s-1)/2 games and the s-1 others have to stay below target's wins w,
+            so s(s-1)/2 - w <= (s-1)(w-1), and deleting can only lower w
+        '''
+        size, wins = present.bit_count(), (graph.beats[target] & present).bit_count()
+        while size * (size - 1) // 2 - wins > (size - 1) * (wins - 1):
+            size -= 1
+        dominators = present & ~graph.beats[target] & ~(1 << target)
+        inside = [excess for excess, r in rivals if dominators >> r & 1 and not kept >> r & 1]
+        outside = [excess for excess, r in rivals if not dominators >> r & 1 and not kept >> r & 1]
+        lowest = max([excess for excess, r in rivals if kept >> r & 1], default=0)
+        bound = budget + 1
+        for q in range(lowest, min(budget, (dominators & ~kept).bit_count()) + 1):
+            if sum(excess > q for excess in inside) <= q:
+                bound = min(bound, q + sum(excess > q for excess in outside))
+        return max(bound, present.bit_count() - size)
+
+    def minimum_addition(graph: tournament, target: int, pool: int) -> list:
+        '''
+            Smallest set of pool candidates whose addition to the present candidates of graph makes target the unique Copeland winner, None if there is none
+            Adding x only closes the gap between target and a rival r when target beats x and r does not, so a rival with excess e
+            needs e such spoilers: the largest excess is a lower bound on the additions still needed, and the rival with the fewest
+            helpful spoilers is branched on (iterative deepening, failures memoized as in minimum_deletion)
+        '''
+        beats = graph.beats
+        failed = {}
+
+        def search(present, budget):
+            rivals = utils.violations(graph, target, present)
+            if not rivals:
+                return []
+            if max(rivals)[0] > budget or failed.get(present, -1) >= budget:
+                return None
+            helpful = [beats[target] & ~beats[r] & pool & ~present for excess, r in rivals]
+            for x in graph.members(min(helpful, key=int.bit_count)):
+                found = search(present | (1 << x), budget - 1)
+                if found is not None:
+                    return [x] + found
+            failed[present] = budget
+            return None
+
+        for budget in range(pool.bit_count() + 1):
+            found = search(graph.present, budget)
+            if found is not None:
+                return sorted(found)
+        return None
     
 
     
@@ -1,30 +1,29 @@
 
-import matplotlib.pyplot as plt 
+import os
+import sys
+import numpy as np
+if __package__ in (None, ""):
+    # Started as "python p4.py" from hw3/ (see README.md), the voting package sits in the repository root
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from voting.profiles import anonymous_profile
+from voting.ballot_files import read_profile
 
 def load_and_extract_file(file_name: str) -> tuple:
     '''
         $ Input: dataset.txt (or a text file with a certain format)
         $ Output: profile matrix (list of list - inner list representing a ballot - transpose required) 
+        $ Parsing (chunked, multi-character names) is shared with voting.ballot_files.read_profile, nothing is cached
     '''
-    # Read file, store to dataset var
-    with open(file=file_name, mode="r") as f:
-        dataset = f.readlines()
-    
-    # Refine each string to remove spaces and new line characters
-    dataset = list(map(lambda x: x.replace(" ", "").rstrip("\n"), dataset))    
-    
-    # Take only the sublists which have length > 1 (these are rows of profiles)
-    profile = list(map(lambda x: list(map(lambda z: str(z), x)) , filter(lambda y: len(y) > 1, dataset)))
-    
-    # This is the transpose (this converst the list from rows of profiles (positions) to a preference ordering)
-    profile = [[profile[j][i] for j in range(len(profile))] for i in range(len(profile[0]))]
-    
-    return profile 
+    ballots, alternatives, _ = read_profile(file_name)
+    return [[alternatives[i] for i in ballot] for ballot in ballots.tolist()]
 
 def single_peaked_preference(profile, orderings):
     '''
         This method plots preferences based on the loaded preference
     '''
+    # Plotting stack is only imported when a plot is drawn
+    import matplotlib.pyplot as plt
+
     # Iterate over orderings
     for idx, ordering in enumerate(orderings):
         # Iterate over each ballot
@@ -40,16 +39,121 @@ def single_peaked_preference(profile, orderings):
         plt.show()
         
 
+def single_peaked_axis(profile, alternatives: tuple = None) -> list:
+    '''
+        Return an axis (alternatives from left to right) on which every ballot is single-peaked, None if the profile is not single-peaked
+        The axis is built from both ends inwards, O(n*m) over the distinct ballots:
+            - every ballot's worst remaining alternative has to sit at an end of the remaining interval, so there are at most two of them
+            - a voter whose peak is already placed on the left ranks the rest decreasingly from left to right, so its worst goes right
+              (and the other way round for peaks on the right)
+            - a voter whose peak is still inside has to prefer each newly placed alternative to the one placed before it on that side
+        The axis found is checked against the whole profile before it is returned
+    '''
+    profile = utils.to_profile(profile, alternatives)
+    ballots, ranks = profile.ballots.astype(np.int64), profile.ranks.astype(np.int64)
+    num_ballots, m = ballots.shape
+    rows = np.arange(num_ballots)
+    # Where each ballot's peak sits so far: 0 still inside, 1 on the left part, 2 on the right part
+    side = np.zeros(num_ballots, dtype=np.int8)
+    # pointer[v] walks up ballot v from the bottom to its worst remaining alternative
+    pointer = np.full(num_ballots, m - 1)
+    placed = np.zeros(m, dtype=bool)
+    left, right = [], []
+    while len(left) + len(right) < m:
+        stale = placed[ballots[rows, pointer]]
+        while stale.any():
+            pointer[stale] -= 1
+            stale = placed[ballots[rows, pointer]]
+        worst = ballots[rows, pointer]
+        ends = np.flatnonzero(np.bincount(worst, minlength=m)).tolist()
+        if len(ends) > 2:
+            return None
+        options = [(ends[0], ends[1]), (ends[1], ends[0])] if len(ends) == 2 else [(ends[0], None), (None, ends[0])]
+        if len(left) + len(right) < m - 1:
+            # Worst alternatives of voters peaked on one side are forced onto the other side
+            to_right = set(np.flatnonzero(np.bincount(worst[side == 1], minlength=m)).tolist())
+            to_left = set(np.flatnonzero(np.bincount(worst[side == 2], minlength=m)).tolist())
+            options = [(a, b) for a, b in options if a not in to_right and b not in to_left and
+                       (not to_right or b in to_right) and (not to_left or a in to_left)]
+        for a, b in options:
+            if utils.fits(ranks, side, a, left[-1] if left else None, 1) and utils.fits(ranks, side, b, right[-1] if right else None, 2):
+                break
+        else:
+            return None
+        for alternative, part, code in ((a, left, 1), (b, right, 2)):
+            if alternative is not None:
+                part.append(alternative)
+                placed[alternative] = True
+                side[ballots[:, 0] == alternative] = code
+    axis = left + right[::-1]
+    if not utils.unimodal(ranks, axis):
+        return None
+    return [profile.alternatives[i] for i in axis]
+
+def is_single_peaked(profile, axis: list, alternatives: tuple = None) -> bool:
+    '''
+        Check whether every ballot is single-peaked on the given axis (a list of alternatives from left to right), O(n*m)
+    '''
+    profile = utils.to_profile(profile, alternatives)
+    position = {profile.alternatives[i]: i for i in range(len(profile.alternatives))}
+    return utils.unimodal(profile.ranks.astype(np.int64), [position[alternative] for alternative in axis])
+
+def validate_orderings(profile, orderings: list, alternatives: tuple = None) -> list:
+    '''
+        For every candidate axis in orderings, whether the profile is single-peaked on it (no plotting needed)
+    '''
+    profile = utils.to_profile(profile, alternatives)
+    return [is_single_peaked(profile, ordering) for ordering in orderings]
+
+class utils:
+    '''
+        Helpers for single-peakedness
+    '''
+
+    def to_profile(profile, alternatives: tuple = None) -> anonymous_profile:
+        '''
+            Compress a list of ballots (as loaded by load_and_extract_file) unless it already is an anonymous_profile
+        '''
+        if isinstance(profile, anonymous_profile):
+            return profile
+        if alternatives is None:
+            alternatives = tuple(sorted(profile[0]))
+        return anonymous_profile.from_dict(dict(enumerate(profile)), alternatives)
+
+    def fits(ranks: np.ndarray, side: np.ndarray, alternative: int, neighbour: int, part: int) -> bool:
+        '''
+            Whether alternative can be placed next to neighbour (the innermost alternative of the left part 1 or right part 2)
+            Voters peaked inside or on the other part need the new alternative to be preferred, voters peaked on this part the opposite
+        '''
+        if alternative is None or neighbour is None:
+            return True
+        closer = ranks[:, alternative] < ranks[:, neighbour]
+        return bool(np.all(np.where(side == part, ~closer, closer)))
+
+    def unimodal(ranks: np.ndarray, axis: list) -> bool:
+        '''
+            True when along the axis every ballot's ranks first only go down (better) and then only go up (worse)
+        '''
+        steps = np.diff(ranks[:, axis], axis=1)
+        worse = np.maximum.accumulate(steps > 0, axis=1)
+        return not (worse[:, :-1] & (steps[:, 1:] < 0)).any()
+
 
 if __name__ == "__main__":
     # Entry point - PLEASE MAKE SURE TO SPECIFY DATASET FILE HERE BY PATH
-    #               CURRENTLY THIS ASSUMES .TXT FILE EXISTS IN THE SAME DIRECTORY
-    profile = load_and_extract_file("profile.txt")
-    orderings = load_and_extract_file("orderings.txt")
+    #               CURRENTLY THIS ASSUMES .TXT FILE EXISTS IN THE SAME DIRECTORY AS THIS SCRIPT
+    here = os.path.dirname(os.path.abspath(__file__))
+    profile = load_and_extract_file(os.path.join(here, "profile.txt"))
+    orderings = load_and_extract_file(os.path.join(here, "orderings.txt"))
     
     # Uncomment below line for printing purposes
     # print(profile)
     # print(orderings)
 
-    # Call the plotting function
-    single_peaked_preference(profile, orderings)
+    # Recover an axis and check the hand-supplied orderings without plotting
+    print(f"Single-peaked axis: {single_peaked_axis(profile)}")
+    for idx, valid in enumerate(validate_orderings(profile, orderings)):
+        print(f"ordering {idx+1} is {'' if valid else 'not '}a single-peaked axis")
+
+    # Uncomment below line to plot the ballots against the orderings
+    # single_peaked_preference(profile, orderings)
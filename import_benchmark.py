@@ -0,0 +1,45 @@
+import os
+import sys
+import json
+import subprocess
+
+# Modules whose import is on the cold start path of the workers
+MODULES = ("voting.profiles", "voting.ballot_files", "voting.generators", "hw1.p1", "hw1.p4", "hw2.p2", "hw2.p4", "hw3.p1", "hw3.p2", "hw3.p3_part_a", "hw3.p3_part_b", "hw3.p4")
+# Display and optional libraries that must only be imported on first use
+DEFERRED = ("tabulate", "matplotlib", "networkx", "fractions", "statistics", "multiprocessing")
+# Cold start budget per module in milliseconds (numpy alone accounts for most of it)
+BUDGET_MS = 400
+
+def measure_import(module: str, repeats: int = 5) -> tuple:
+    '''
+        Import module in fresh interpreters and return the best wall time in milliseconds and the deferred libraries it pulled in
+    '''
+    probe = ("import sys, time, json\n"
+             "start = time.perf_counter()\n"
+             f"import {module}\n"
+             "elapsed = (time.perf_counter() - start) * 1000\n"
+             f"print(json.dumps([elapsed, [name for name in {DEFERRED!r} if name in sys.modules]]))\n")
+    root = os.path.dirname(os.path.abspath(__file__))
+    best, loaded = None, []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", probe], cwd=root, capture_output=True, text=True, check=True).stdout
+        elapsed, loaded = json.loads(output)
+        best = elapsed if best is None else min(best, elapsed)
+    return best, loaded
+
+def run_benchmark(budget_ms: float = BUDGET_MS) -> bool:
+    '''
+        Print the cold start time of every module and return whether all of them stay under budget without deferred imports
+    '''
+    passed = True
+    for module in MODULES:
+        elapsed, loaded = measure_import(module)
+        ok = elapsed <= budget_ms and not loaded
+        passed = passed and ok
+        print(f"{module:<20} {elapsed:8.1f} ms  {'ok' if ok else 'FAIL'}{'  loads ' + ', '.join(loaded) if loaded else ''}")
+    return passed
+
+if __name__ == "__main__":
+    # Optional budget in milliseconds as the first argument
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_MS
+    sys.exit(0 if run_benchmark(budget) else 1)
@@ -0,0 +1,14 @@
+'''
+    $ Random inputs shared by the test modules, every test seeds its own random.Random so failures reproduce
+'''
+import random
+
+def random_profile(rng: random.Random, num_voters: int, alternatives: tuple, distinct: int = None) -> dict:
+    '''
+        Voter -> ballot dictionary of uniformly random ballots
+        With distinct, every voter picks one of that many random ballots, so repeated ballots and ties between outcomes are common
+    '''
+    if distinct is None:
+        return {f"v{v}": rng.sample(alternatives, len(alternatives)) for v in range(num_voters)}
+    pool = [rng.sample(alternatives, len(alternatives)) for _ in range(distinct)]
+    return {f"v{v}": list(rng.choice(pool)) for v in range(num_voters)}
@@ -0,0 +1,19 @@
+'''
+    $ Runs every test_* function of every test_*.py module in this directory, plain asserts so no test runner is needed
+    $ Usage: python -m tests.run_all (from the repository root), pytest collects the same functions
+'''
+import importlib
+import pkgutil
+import time
+import tests
+
+if __name__ == "__main__":
+    for module_info in pkgutil.iter_modules(tests.__path__):
+        if not module_info.name.startswith("test_"):
+            continue
+        module = importlib.import_module(f"tests.{module_info.name}")
+        for name in sorted(vars(module)):
+            if name.startswith("test_") and callable(getattr(module, name)):
+                start = time.perf_counter()
+                getattr(module, name)()
+                print(f"{module_info.name + '.' + name:60} ok {time.perf_counter() - start:6.2f}s")
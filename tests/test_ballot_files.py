@@ -0,0 +1,103 @@
+'''
+    $ Ballot files in voting/ballot_files.py: both layouts against a plain parse, and the binary cache following edits to the file
+'''
+import os
+import random
+import string
+import tempfile
+import numpy as np
+from voting.ballot_files import read_profile
+from tests.helpers import random_profile
+
+def write_ballots(path: str, ballots: list, weight: list, layout: str):
+    '''
+        Ballot file with one ballot per line ("ballot") or one position per line ("position"), the weights after the ballots
+    '''
+    rows = ballots if layout == "ballot" else [list(position) for position in zip(*ballots)]
+    with open(path, mode="w") as f:
+        for row in rows:
+            f.write(" ".join(row) + "\n")
+        f.write("\n")
+        for w in weight:
+            f.write(f"{w}\n")
+
+def expected_ballots(ballots: list, alternatives: tuple) -> list:
+    '''
+        Ballots as index lists into the sorted label table
+    '''
+    return [[alternatives.index(label) for label in ballot] for ballot in ballots]
+
+def random_file(rng: random.Random, directory: str, layout: str) -> tuple:
+    '''
+        Random ballots over labels of different lengths, written to a file in directory
+    '''
+    labels = tuple(rng.sample([c * rng.randint(1, 3) for c in string.ascii_letters], rng.randint(2, 7)))
+    ballots = list(random_profile(rng, rng.randint(2, 12), labels, rng.choice((None, 2))).values())
+    weight = [rng.randint(1, 5) for _ in range(rng.randint(0, 3))]
+    path = os.path.join(directory, f"{layout}.txt")
+    write_ballots(path, ballots, weight, layout)
+    return path, ballots, tuple(sorted(labels)), weight
+
+def test_read_profile():
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        for _ in range(60):
+            layout = rng.choice(("position", "ballot"))
+            path, ballots, alternatives, weight = random_file(rng, directory, layout)
+            # Chunks of a few lines split the file at arbitrary rows
+            result, labels, weights = read_profile(path, layout, chunk_size=rng.randint(1, 5), cache=False)
+            assert labels == alternatives and weights == weight
+            assert result.dtype == np.int8 and result.tolist() == expected_ballots(ballots, alternatives), (ballots, result)
+
+def test_cache():
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as directory:
+        path, ballots, alternatives, weight = random_file(rng, directory, "ballot")
+        first = read_profile(path, "ballot", cache=True)
+        assert os.path.exists(path + ".cache.npy") and os.path.exists(path + ".cache.json")
+        second = read_profile(path, "ballot", cache=True)
+        assert isinstance(second[0], np.memmap)
+        assert second[0].tolist() == first[0].tolist() == expected_ballots(ballots, alternatives)
+        assert second[1:] == first[1:] == (alternatives, weight)
+        # Same size, new modification time: the cache is stale
+        reordered = [ballot[::-1] for ballot in ballots]
+        write_ballots(path, reordered, weight, "ballot")
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        result = read_profile(path, "ballot", cache=True)
+        assert result[0].tolist() == expected_ballots(reordered, alternatives)
+        # Different size
+        write_ballots(path, ballots[:1], weight, "ballot")
+        result = read_profile(path, "ballot", cache=True)
+        assert result[0].tolist() == expected_ballots(ballots[:1], tuple(sorted(ballots[0])))
+        # The layout is part of the stamp too
+        result = read_profile(path, "position", cache=True)
+        assert result[0].tolist() == [[i] for i in expected_ballots(ballots[:1], tuple(sorted(ballots[0])))[0]]
+
+def test_cache_opt_in():
+    rng = random.Random(2)
+    with tempfile.TemporaryDirectory() as directory:
+        path, ballots, alternatives, weight = random_file(rng, directory, "position")
+        read_profile(path)
+        assert sorted(os.listdir(directory)) == ["position.txt"]
+
+def test_malformed():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bad.txt")
+        for lines in (["a b c", "b a"], ["a b", "b a c", "c a b"], ["a b a", "b a c"], ["aa b", "b aa", "b b"]):
+            with open(path, mode="w") as f:
+                f.write("\n".join(lines) + "\n")
+            # A short row has to be caught inside a chunk and across chunks
+            for chunk_size in (1, 2, 100):
+                try:
+                    read_profile(path, "ballot", chunk_size=chunk_size, cache=False)
+                except ValueError:
+                    continue
+                raise AssertionError(f"{lines} read without an error")
+
+if __name__ == "__main__":
+    test_read_profile()
+    test_cache()
+    test_cache_opt_in()
+    test_malformed()
+    print("ok")
@@ -0,0 +1,75 @@
+'''
+    $ Voter removal under Borda (hw3/p3_part_a): smallest coalitions against every subset of at most k voters
+'''
+import itertools
+import random
+import string
+import numpy as np
+from hw3.p3_part_a import voting_rules, utils
+from tests.helpers import random_profile
+
+def borda_co_winner(profile: dict, alternatives: tuple, target: str, removed: set) -> bool:
+    '''
+        Whether target has the highest Borda score once the removed voters are gone
+    '''
+    score = {a: 0 for a in alternatives}
+    for voter, ballot in profile.items():
+        if voter not in removed:
+            for position, a in enumerate(ballot):
+                score[a] += len(alternatives) - 1 - position
+    return score[target] == max(score.values())
+
+def brute_removal(profile: dict, alternatives: tuple, target: str, k: int) -> int:
+    '''
+        Size of the smallest set of at most k voters whose removal makes target a Borda (co-)winner, None if there is none
+    '''
+    for size in range(k + 1):
+        for removed in itertools.combinations(profile, size):
+            if borda_co_winner(profile, alternatives, target, set(removed)):
+                return size
+    return None
+
+def test_coalition_removals():
+    rng = random.Random(0)
+    for _ in range(200):
+        alternatives = tuple(string.ascii_lowercase[:rng.randint(2, 6)])
+        # Few distinct ballots give voters with equal gains, which are merged
+        profile = random_profile(rng, rng.randint(1, 9), alternatives, rng.choice((None, 2, 3)))
+        k = rng.randint(1, 3)
+        removals = voting_rules(profile, alternatives).coalition_removals(k)
+        assert set(removals) == set(alternatives)
+        for target, coalition in removals.items():
+            expected = brute_removal(profile, alternatives, target, k)
+            if expected is None:
+                assert coalition is None, (profile, k, target, coalition)
+                continue
+            assert coalition is not None and len(set(coalition)) == len(coalition) == expected, (profile, k, target, coalition)
+            assert set(coalition) <= set(profile) and borda_co_winner(profile, alternatives, target, set(coalition))
+
+def test_smallest_cover():
+    rng = np.random.default_rng(1)
+    for _ in range(300):
+        rows, columns, k = int(rng.integers(1, 6)), int(rng.integers(1, 4)), int(rng.integers(1, 4))
+        gains = rng.integers(-3, 4, size=(rows, columns))
+        counts = rng.integers(1, 3, size=rows)
+        deficits = rng.integers(-2, 7, size=columns)
+        # Every multiset of at most k rows within the counts, smallest first
+        expected = None
+        for size in range(k + 1):
+            for chosen in itertools.combinations_with_replacement(range(rows), size):
+                if all(chosen.count(r) <= counts[r] for r in set(chosen)) and (gains[list(chosen)].sum(axis=0) >= deficits).all():
+                    expected = size
+                    break
+            if expected is not None:
+                break
+        found = utils.smallest_cover(gains, counts, deficits, k)
+        if expected is None:
+            assert found is None, (gains, counts, deficits, k, found)
+            continue
+        assert found is not None and len(found) == expected, (gains, counts, deficits, k, found)
+        assert all(found.count(r) <= counts[r] for r in set(found)) and (gains[found].sum(axis=0) >= deficits).all()
+
+if __name__ == "__main__":
+    test_coalition_removals()
+    test_smallest_cover()
+    print("ok")
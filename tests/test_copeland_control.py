@@ -0,0 +1,83 @@
+'''
+    $ Control by deleting or adding candidates under the modified Copeland rule of hw3/p3_part_b, every subset of candidates is tried
+'''
+import itertools
+import random
+import string
+from hw3.p3_part_b import modified_copeland
+from tests.helpers import random_profile
+
+def beats(profile: dict, alternatives: tuple) -> dict:
+    '''
+        (a, b) -> whether a beats b, straight from the ballots; a tied pair goes to the later alternative
+    '''
+    result = {}
+    for i, a in enumerate(alternatives):
+        for j, b in enumerate(alternatives):
+            if i != j:
+                margin = sum(1 if ballot.index(a) < ballot.index(b) else -1 for ballot in profile.values())
+                result[(a, b)] = margin > 0 or (margin == 0 and i > j)
+    return result
+
+def unique_winner(wins: dict, target: str, present: set) -> bool:
+    '''
+        Whether target has strictly more wins than everybody else among the present alternatives
+    '''
+    score = {a: sum(wins[(a, b)] for b in present if b != a) for a in present}
+    return all(score[target] > score[a] for a in present if a != target)
+
+def brute_deletion(wins: dict, target: str, alternatives: tuple) -> int:
+    '''
+        Size of the smallest set of other alternatives whose deletion makes target the unique winner
+    '''
+    others = [a for a in alternatives if a != target]
+    for size in range(len(others) + 1):
+        for deleted in itertools.combinations(others, size):
+            if unique_winner(wins, target, set(alternatives) - set(deleted)):
+                return size
+
+def brute_addition(wins: dict, target: str, registered: tuple, spoilers: tuple) -> int:
+    '''
+        Size of the smallest set of spoilers whose addition makes target the unique winner, None if there is none
+    '''
+    for size in range(len(spoilers) + 1):
+        for added in itertools.combinations(spoilers, size):
+            if unique_winner(wins, target, set(registered) | set(added)):
+                return size
+    return None
+
+def test_minimum_deletions():
+    rng = random.Random(0)
+    for _ in range(150):
+        alternatives = tuple(string.ascii_lowercase[:rng.randint(2, 8)])
+        profile = random_profile(rng, rng.randint(1, 8), alternatives)
+        wins = beats(profile, alternatives)
+        deletions = modified_copeland(profile, alternatives).minimum_deletions()
+        for target, deleted in deletions.items():
+            assert target not in deleted and len(set(deleted)) == len(deleted)
+            assert unique_winner(wins, target, set(alternatives) - set(deleted)), (profile, target, deleted)
+            assert len(deleted) == brute_deletion(wins, target, alternatives), (profile, target, deleted)
+
+def test_minimum_additions():
+    rng = random.Random(1)
+    for _ in range(150):
+        alternatives = tuple(string.ascii_lowercase[:rng.randint(2, 8)])
+        profile = random_profile(rng, rng.randint(1, 8), alternatives)
+        wins = beats(profile, alternatives)
+        registered = tuple(sorted(rng.sample(alternatives, rng.randint(1, len(alternatives)))))
+        spoilers = tuple(a for a in alternatives if a not in registered)
+        additions = modified_copeland(profile, alternatives).minimum_additions(registered)
+        assert set(additions) == set(registered)
+        for target, added in additions.items():
+            expected = brute_addition(wins, target, registered, spoilers)
+            if expected is None:
+                assert added is None, (profile, registered, target, added)
+                continue
+            assert added is not None and set(added) <= set(spoilers), (profile, registered, target, added)
+            assert unique_winner(wins, target, set(registered) | set(added)), (profile, registered, target, added)
+            assert len(added) == expected, (profile, registered, target, added)
+
+if __name__ == "__main__":
+    test_minimum_deletions()
+    test_minimum_additions()
+    print("ok")
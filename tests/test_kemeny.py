@@ -0,0 +1,114 @@
+'''
+    $ Exact Kemeny solvers of hw2/p2 against the total kendall-tau distance of every linear ordering
+'''
+import contextlib
+import io
+import itertools
+import random
+import string
+import tracemalloc
+from hw2 import p2
+from hw2.p2 import kemeny_winner, kemeny_rankings, kemeny_parallel, kemeny_approximation, kemeny_enumeration, kemeny_dynamic_program, pairwise_counts
+from tests.helpers import random_profile
+
+def brute_distance(profile: dict, ordering) -> int:
+    '''
+        Total kendall-tau distance of ordering to the ballots, one disagreeing voter and pair at a time
+    '''
+    return sum(ballot.index(ordering[q]) < ballot.index(ordering[p])
+               for ballot in profile.values() for p in range(len(ordering)) for q in range(p+1, len(ordering)))
+
+def brute_optimum(profile: dict, alternatives: tuple) -> tuple:
+    '''
+        Smallest total kendall-tau distance to the ballots and every ordering achieving it
+    '''
+    best, orderings = None, []
+    for ordering in itertools.permutations(alternatives):
+        distance = brute_distance(profile, ordering)
+        if best is None or distance < best:
+            best, orderings = distance, []
+        if distance == best:
+            orderings.append(ordering)
+    return best, orderings
+
+def cases(seed: int, count: int, largest: int = 6):
+    '''
+        count random profiles with up to largest alternatives, each with its brute force optimum
+    '''
+    rng = random.Random(seed)
+    for _ in range(count):
+        alternatives = tuple(string.ascii_lowercase[:rng.randint(1, largest)])
+        profile = random_profile(rng, rng.randint(1, 7), alternatives, distinct=rng.choice((None, 1, 2, 3)))
+        yield profile, alternatives, brute_optimum(profile, alternatives)
+
+def test_dynamic_program():
+    for profile, alternatives, (best, orderings) in cases(0, 120):
+        assert kemeny_dynamic_program(pairwise_counts(profile, alternatives))[-1] == best, profile
+        assert kemeny_winner(profile, alternatives) == {ordering[0] for ordering in orderings}, profile
+        distance, rankings = kemeny_rankings(profile, alternatives)
+        assert distance == best and sorted(rankings) == sorted(orderings), profile
+        distance, rankings = kemeny_rankings(profile, alternatives, limit=2)
+        assert distance == best and len(rankings) == min(2, len(orderings)) and set(rankings) <= set(orderings), profile
+
+def test_approximation():
+    for profile, alternatives, (best, orderings) in cases(1, 120):
+        for seed in ("borda", "copeland"):
+            ranking, distance, lower_bound = kemeny_approximation(profile, alternatives, seed)
+            assert sorted(ranking) == sorted(alternatives), profile
+            assert distance == brute_distance(profile, ranking) and lower_bound <= best <= distance, profile
+        assert kemeny_winner(profile, alternatives, method="approximate") == {kemeny_approximation(profile, alternatives)[0][0]}, profile
+
+def test_enumeration():
+    for profile, alternatives, (best, orderings) in cases(2, 80):
+        winners = {ordering[0] for ordering in orderings}
+        # Small batches so that the best set and the heap are carried across batch boundaries
+        assert kemeny_enumeration(profile, alternatives, batch_size=7) == winners, profile
+        assert kemeny_enumeration(profile, alternatives, top_k=3, batch_size=5) == winners, profile
+        assert kemeny_winner(profile, alternatives, method="enumerate") == winners, profile
+    # Two opposite voters: all 9! orderings are optimal, only their heads and the report heap are kept
+    alternatives = tuple(string.ascii_lowercase[:9])
+    profile = {"v1": list(alternatives), "v2": list(alternatives[::-1])}
+    tracemalloc.start()
+    report = io.StringIO()
+    with contextlib.redirect_stdout(report):
+        assert kemeny_enumeration(profile, alternatives, report=True, batch_size=4096) == set(alternatives)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # Keeping every optimal ordering took about 50 MB here
+    assert peak < 10 * 2**20, peak
+    assert report.getvalue().count("| (") == 10
+
+def test_branch_and_bound():
+    # The shards are searched in this process, the pool only distributes the same calls
+    for profile, alternatives, (best, orderings) in cases(3, 120):
+        _, upper_bound, _ = kemeny_approximation(profile, alternatives)
+        p2.utils.share_pairs(pairwise_counts(profile, alternatives).tolist())
+        for limit in (None, 1, 2):
+            results = [p2.utils.search_prefix((c,), upper_bound, limit) for c in range(len(alternatives))]
+            assert min(local for local, found in results if found) == best, profile
+            found = [tuple(alternatives[c] for c in ordering) for local, shard in results if local == best for ordering in shard]
+            if limit is None:
+                assert sorted(found) == sorted(orderings), profile
+                continue
+            assert set(found) <= set(orderings) and all(len(shard) <= limit for _, shard in results), profile
+            # Every shard whose prefix starts an optimal ordering still keeps one
+            assert {ordering[0] for ordering in found} == {ordering[0] for ordering in orderings}, profile
+
+def test_process_pool():
+    for profile, alternatives, (best, orderings) in cases(4, 3, largest=5):
+        distance, rankings = kemeny_parallel(profile, alternatives, processes=2)
+        assert distance == best and sorted(rankings) == sorted(orderings), profile
+        assert kemeny_winner(profile, alternatives, processes=2) == {ordering[0] for ordering in orderings}, profile
+    # Every ordering ties on a profile of two opposite voters, the limit keeps the shards from collecting all m! of them
+    alternatives = tuple(string.ascii_lowercase[:9])
+    profile = {"v1": list(alternatives), "v2": list(alternatives[::-1])}
+    distance, rankings = kemeny_parallel(profile, alternatives, processes=2, limit=1)
+    assert distance == 36 and len(rankings) == len(alternatives)
+
+if __name__ == "__main__":
+    test_dynamic_program()
+    test_approximation()
+    test_enumeration()
+    test_branch_and_bound()
+    test_process_pool()
+    print("ok")
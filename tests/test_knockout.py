@@ -0,0 +1,157 @@
+'''
+    $ Knockout win probabilities of hw3/p1 against the per-candidate recursion they replaced
+'''
+import random
+import string
+from functools import lru_cache
+from itertools import combinations, permutations
+import numpy as np
+from hw3.p1 import fix_tournament, knockout_probabilities, simulate_knockout
+from voting.profiles import anonymous_profile
+from tests.helpers import random_profile
+
+def recursive_probability(x, v, Q, candidates) -> float:
+    '''
+        Probability that x wins subtree v, computed the old way: recurse into the subtree holding x and sum over the other side
+    '''
+    if len(v) == 1:
+        return 1.0 if v[0] == x else 0.0
+    l, r = v
+    if x not in descendants(l):
+        l, r = r, l
+    return recursive_probability(x, l, Q, candidates) * sum(recursive_probability(y, r, Q, candidates) * Q[candidates[x]][candidates[y]]
+                                                            for y in descendants(r))
+
+def descendants(v) -> set:
+    '''
+        Candidates in the leaves of subtree v
+    '''
+    if len(v) == 1:
+        return {v[0]}
+    return descendants(v[0]) | descendants(v[1])
+
+def random_bracket(rng: random.Random, names: list) -> list:
+    '''
+        Random binary bracket over names with leaves written ['a'], balanced or not
+    '''
+    if len(names) == 1:
+        return [names[0]]
+    split = rng.randint(1, len(names) - 1)
+    return [random_bracket(rng, names[:split]), random_bracket(rng, names[split:])]
+
+def random_matrix(rng: random.Random, alternatives: tuple) -> list:
+    '''
+        Pairwise win probabilities of a random profile (ties between two candidates are 1/2 each)
+    '''
+    profile = random_profile(rng, rng.randint(1, 9), alternatives)
+    return anonymous_profile.from_dict(profile, alternatives).majority_matrix.probabilities().tolist()
+
+def test_knockout_probabilities():
+    rng = random.Random(0)
+    for _ in range(100):
+        alternatives = tuple(string.ascii_lowercase[:rng.randint(1, 9)])
+        candidates = {alternative: idx for idx, alternative in enumerate(alternatives)}
+        Q = random_matrix(rng, alternatives)
+        bracket = random_bracket(rng, rng.sample(alternatives, len(alternatives)))
+        result = knockout_probabilities(bracket, Q, candidates)
+        for x in alternatives:
+            assert abs(result[x] - recursive_probability(x, bracket, Q, candidates)) < 1e-12, (Q, bracket, x)
+        assert abs(sum(result.values()) - 1) < 1e-12
+
+def test_fix_tournament():
+    rng = random.Random(1)
+    for _ in range(12):
+        alternatives = tuple(string.ascii_lowercase[:rng.choice((2, 4, 4, 8))])
+        candidates = {alternative: idx for idx, alternative in enumerate(alternatives)}
+        Q = random_matrix(rng, alternatives)
+        target = rng.choice(alternatives)
+        bracket, value = fix_tournament(Q, candidates, target)
+        # A balanced bracket is symmetric, so target can stay in the first leaf
+        best = 0.0
+        for order in permutations([a for a in alternatives if a != target]):
+            seeding = (target,) + order
+            level = [[name] for name in seeding]
+            while len(level) > 1:
+                level = [[level[i], level[i+1]] for i in range(0, len(level), 2)]
+            best = max(best, knockout_probabilities(level[0], Q, candidates)[target])
+        assert abs(value - best) < 1e-12, (Q, target)
+        assert abs(knockout_probabilities(bracket, Q, candidates)[target] - value) < 1e-12
+
+def best_blocks(Q: np.ndarray, t: int) -> callable:
+    '''
+        best(players) is the largest probability that t beats the winner of a balanced bracket over players (a sorted tuple)
+        Winner distributions of all arrangements of a block are built at once from those of its halves
+    '''
+    @lru_cache(maxsize=None)
+    def winners(players):
+        if len(players) == 1:
+            return np.eye(len(Q))[[players[0]]]
+        first, rest = players[0], players[1:]
+        splits = [((first,) + partners, tuple(y for y in rest if y not in partners)) for partners in combinations(rest, len(players)//2 - 1)]
+        # Every arrangement of the left half against every arrangement of the right half
+        L = np.stack([winners(left) for left, _ in splits])[:, :, None, :]
+        R = np.stack([winners(right) for _, right in splits])[:, None, :, :]
+        return (L * (R @ Q.T) + R * (L @ Q.T)).reshape(-1, len(Q))
+
+    @lru_cache(maxsize=None)
+    def best(players):
+        return float((winners(players) @ Q[t]).max())
+
+    return best
+
+def optimal_seeding_value(Q: np.ndarray, t: int) -> float:
+    '''
+        Largest winning probability of t over all balanced seedings: t meets the winners of blocks of 1, 2, 4, ... players, and
+        every block is arranged on its own, so it is a maximum over the ways to split the other players into those blocks
+    '''
+    best = best_blocks(Q, t)
+
+    @lru_cache(maxsize=None)
+    def split(remaining, block_size):
+        if len(remaining) == block_size:
+            return best(remaining)
+        return max(best(block) * split(tuple(y for y in remaining if y not in block), 2 * block_size)
+                   for block in combinations(remaining, block_size))
+
+    return split(tuple(y for y in range(len(Q)) if y != t), 1)
+
+def test_fix_tournament_sixteen():
+    rng = random.Random(3)
+    alternatives = tuple(string.ascii_lowercase[:16])
+    candidates = {alternative: idx for idx, alternative in enumerate(alternatives)}
+    # Pairwise probabilities without ties, swap based local search alone misses the optimum here
+    Q = [[0.5] * 16 for _ in range(16)]
+    for i, j in combinations(range(16), 2):
+        Q[i][j] = rng.random()
+        Q[j][i] = 1 - Q[i][j]
+    expected = optimal_seeding_value(np.array(Q), candidates["a"])
+    # Without restarts the branch and bound starts from a plain seeding and has to find the optimum itself
+    for restarts in (0, 20):
+        bracket, value = fix_tournament(Q, candidates, "a", restarts=restarts, seed=0)
+        assert abs(value - expected) <= 1e-9 * expected, (value, expected)
+        assert abs(knockout_probabilities(bracket, Q, candidates)["a"] - value) <= 1e-9 * value
+
+def test_simulate_knockout():
+    rng = random.Random(2)
+    for _ in range(10):
+        alternatives = tuple(string.ascii_lowercase[:rng.randint(2, 8)])
+        candidates = {alternative: idx for idx, alternative in enumerate(alternatives)}
+        Q = random_matrix(rng, alternatives)
+        bracket = random_bracket(rng, rng.sample(alternatives, len(alternatives)))
+        exact = knockout_probabilities(bracket, Q, candidates)
+        # Batches smaller than the trials, the last one partial
+        estimate = simulate_knockout(Q, candidates, bracket, trials=100000, batch_size=30000, seed=7, confidence=0.999)
+        assert estimate == simulate_knockout(Q, candidates, bracket, trials=100000, batch_size=30000, seed=7, confidence=0.999)
+        assert abs(sum(rate for rate, _, _ in estimate.values()) - 1) < 1e-9
+        for x in alternatives:
+            rate, lower, upper = estimate[x]
+            # Wilson bounds of a rate of 0 or 1 are only equal to it up to rounding
+            assert lower - 1e-12 <= rate <= upper + 1e-12
+            assert lower - 1e-12 <= exact[x] <= upper + 1e-12, (Q, bracket, x)
+
+if __name__ == "__main__":
+    test_knockout_probabilities()
+    test_fix_tournament()
+    test_fix_tournament_sixteen()
+    test_simulate_knockout()
+    print("ok")
@@ -0,0 +1,74 @@
+'''
+    $ Possible Copeland winners of hw3/p2 with k new voters, compared with adding every multiset of k ballots
+'''
+import itertools
+import random
+import string
+import numpy as np
+from hw3.p2 import voting_rules, utils
+from tests.helpers import random_profile
+
+def added_margins(margins: np.ndarray, ballots: list) -> np.ndarray:
+    '''
+        Margins after adding the ballots (tuples of alternative indices, best first)
+    '''
+    margins = margins.copy()
+    for ballot in ballots:
+        for p, q in itertools.combinations(ballot, 2):
+            margins[p, q] += 1
+            margins[q, p] -= 1
+    return margins
+
+def co_winner(margins: np.ndarray, c: int, tie_score: float) -> bool:
+    '''
+        Whether c has the highest Copeland score
+    '''
+    score = [utils.copeland_score(np.delete(margins[d], d), tie_score) for d in range(len(margins))]
+    return score[c] == max(score)
+
+def brute_winners(margins: np.ndarray, num_added: int, tie_score: float) -> set:
+    '''
+        Indices of the candidates that some multiset of num_added ballots makes Copeland (co-)winners
+        Every multiset is tallied at once: one margin delta per ballot, summed over the index tuples of the multisets
+    '''
+    m = len(margins)
+    deltas = np.stack([added_margins(np.zeros_like(margins), [ballot]) for ballot in itertools.permutations(range(m))])
+    added = np.array(list(itertools.combinations_with_replacement(range(len(deltas)), num_added)))
+    new = margins + deltas[added].sum(axis=1)
+    off_diagonal = ~np.eye(m, dtype=bool)
+    score = ((new > 0) & off_diagonal).sum(axis=2) + tie_score * ((new == 0) & off_diagonal).sum(axis=2)
+    return set(np.flatnonzero((score == score.max(axis=1, keepdims=True)).any(axis=0)).tolist())
+
+def test_possible_copeland_winners():
+    rng = random.Random(0)
+    for trial in range(400):
+        num_added, tie_score = rng.randint(1, 3), (0, 0.5, 1)[trial % 3]
+        # Three new ballots over five alternatives are already 295240 multisets
+        alternatives = tuple(string.ascii_lowercase[:rng.randint(2, 5 if num_added < 3 else 4)])
+        profile = random_profile(rng, rng.randint(1, 7), alternatives)
+        margins = voting_rules(profile, alternatives).weighted_profile.majority_matrix.margins()
+        expected = {alternatives[c] for c in brute_winners(margins, num_added, tie_score)}
+        assert voting_rules(profile, alternatives).possible_copeland_winners(num_added, tie_score) == expected, \
+            (profile, num_added, tie_score)
+
+def test_greedy_ballot():
+    rng = random.Random(1)
+    for trial in range(150):
+        alternatives = tuple(string.ascii_lowercase[:rng.randint(2, 5)])
+        profile = random_profile(rng, rng.randint(1, 8), alternatives)
+        num_added, tie_score = rng.randint(1, 3), (0, 0.5, 1)[trial % 3]
+        margins = voting_rules(profile, alternatives).weighted_profile.majority_matrix.margins()
+        # Exact for a single new voter
+        possible = brute_winners(margins, 1, tie_score) if num_added == 1 else set()
+        for c in range(len(alternatives)):
+            ballot = utils.greedy_ballot(margins, c, num_added, tie_score)
+            if ballot is not None:
+                assert ballot[0] == c and sorted(ballot) == list(range(len(alternatives))), (profile, c, ballot)
+                assert co_winner(added_margins(margins, [ballot] * num_added), c, tie_score), (profile, c, ballot)
+            if num_added == 1:
+                assert (ballot is not None) == (c in possible), (profile, c, ballot)
+
+if __name__ == "__main__":
+    test_possible_copeland_winners()
+    test_greedy_ballot()
+    print("ok")
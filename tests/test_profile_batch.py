@@ -0,0 +1,68 @@
+'''
+    $ profile_batch (voting/profiles.py) runs every rule on many elections at once, each election is recounted by voting_rules of hw1/p1
+'''
+import random
+import string
+from hw1.p1 import voting_rules
+from voting.profiles import profile_batch, utils
+from tests.helpers import random_profile
+
+def random_batch(rng: random.Random, voter_counts: tuple, shuffled: bool = True) -> tuple:
+    '''
+        A batch of random elections with a few repeated ballots, over shuffled labels (index order and name order differ) or sorted ones
+    '''
+    m = rng.randint(2, 6)
+    alternatives = tuple(rng.sample(string.ascii_lowercase[:m], m) if shuffled else string.ascii_lowercase[:m])
+    num_voters = rng.choice(voter_counts)
+    profiles = [random_profile(rng, num_voters, alternatives, rng.choice((None, 2, 3))) for _ in range(rng.randint(1, 20))]
+    # Small blocks so that several blocks are stacked
+    batch = profile_batch.from_dicts(profiles, alternatives)
+    batch.block = rng.randint(1, 4)
+    return profiles, alternatives, batch
+
+def best(alternatives: tuple, scores) -> set:
+    '''
+        Alternatives with the highest score
+    '''
+    scores = list(scores)
+    return {alternatives[i] for i in range(len(alternatives)) if scores[i] == max(scores)}
+
+def test_rules():
+    rng = random.Random(0)
+    for _ in range(150):
+        profiles, alternatives, batch = random_batch(rng, tuple(range(1, 10)))
+        winners = {"plurality": batch.winner_sets(batch.plurality()), "borda": batch.winner_sets(batch.borda_count()),
+                   "approval": batch.winner_sets(batch.approval_voting()), "condorcet": batch.winner_sets(batch.condorcet_winner()),
+                   "copeland": batch.winner_sets(batch.copeland_winner()), "copeland_0": batch.winner_sets(batch.copeland_winner(0))}
+        for e, profile in enumerate(profiles):
+            rules = voting_rules(profile, alternatives)
+            majority = rules.weighted_profile.majority_matrix
+            m = len(alternatives)
+            expected = {"plurality": best(alternatives, rules.positional_scores(utils.scoring_vector("plurality", m))),
+                        "borda": best(alternatives, rules.positional_scores(utils.scoring_vector("borda", m))),
+                        "condorcet": majority.condorcet_winner(),
+                        "copeland": best(alternatives, majority.copeland_scores(0.5)),
+                        "copeland_0": best(alternatives, majority.copeland_scores(0))}
+            for rule, winner_set in expected.items():
+                assert winners[rule][e] == set(winner_set), (rule, profile, alternatives)
+            # voting_rules picks one of the tied winners
+            assert rules.plurality() in winners["plurality"][e] and rules.borda_count() in winners["borda"][e]
+            assert rules.approval_voting() in winners["approval"][e] and rules.copeland_winner() in winners["copeland"][e]
+
+def test_single_transferable_vote():
+    rng = random.Random(1)
+    for _ in range(300):
+        profiles, alternatives, batch = random_batch(rng, tuple(range(1, 10)))
+        winners = batch.winner_sets(batch.single_transferable_vote())
+        for e, profile in enumerate(profiles):
+            try:
+                winner = voting_rules(profile, alternatives).single_transferable_vote()
+            except IndexError:
+                # Every alternative but one eliminated, voting_rules runs out of ballot positions
+                continue
+            assert winner in winners[e], (profile, alternatives, winners[e])
+
+if __name__ == "__main__":
+    test_rules()
+    test_single_transferable_vote()
+    print("ok")
@@ -0,0 +1,78 @@
+'''
+    $ Single-peakedness in hw3/p4: the recovered axis and the axis check, compared with trying every axis
+'''
+import itertools
+import random
+import string
+from hw3.p4 import single_peaked_axis, is_single_peaked
+from tests.helpers import random_profile
+
+def peaked_on(ballot: list, axis: tuple) -> bool:
+    '''
+        Whether the ballot's positions go down and then up along the axis, straight from the definition
+    '''
+    positions = [ballot.index(alternative) for alternative in axis]
+    peak = positions.index(0)
+    return all(positions[i] > positions[i+1] for i in range(peak)) and \
+           all(positions[i] < positions[i+1] for i in range(peak, len(axis) - 1))
+
+def single_peaked_ballot(rng: random.Random, axis: list) -> list:
+    '''
+        Uniformly random ballot single-peaked on axis, drawn from the bottom: the worst remaining alternative is one end of the interval
+    '''
+    left, right, worst_first = 0, len(axis) - 1, []
+    while left < right:
+        if rng.random() < 0.5:
+            worst_first.append(axis[left])
+            left += 1
+        else:
+            worst_first.append(axis[right])
+            right -= 1
+    return [axis[left]] + worst_first[::-1]
+
+def noisy_profile(rng: random.Random, alternatives: tuple) -> list:
+    '''
+        List of ballots, single-peaked on a random axis with a few ballots possibly swapped or redrawn, now and then uniformly random
+    '''
+    m = len(alternatives)
+    if rng.random() < 0.1:
+        return list(random_profile(rng, rng.randint(1, 8), alternatives).values())
+    axis = rng.sample(alternatives, m)
+    profile = [single_peaked_ballot(rng, axis) for _ in range(rng.randint(1, 8))]
+    for ballot in profile:
+        noise = rng.random()
+        if noise < 0.05:
+            rng.shuffle(ballot)
+        elif noise < 0.15 and m > 1:
+            p = rng.randrange(m - 1)
+            ballot[p], ballot[p+1] = ballot[p+1], ballot[p]
+    return profile
+
+def test_single_peaked_axis():
+    rng = random.Random(0)
+    found = 0
+    for _ in range(600):
+        alternatives = tuple(string.ascii_lowercase[:rng.randint(1, 6)])
+        profile = noisy_profile(rng, alternatives)
+        expected = any(all(peaked_on(ballot, axis) for ballot in profile) for axis in itertools.permutations(alternatives))
+        axis = single_peaked_axis(profile, alternatives)
+        assert (axis is not None) == expected, (profile, axis)
+        if axis is not None:
+            found += 1
+            assert sorted(axis) == list(alternatives), (profile, axis)
+            assert all(peaked_on(ballot, tuple(axis)) for ballot in profile), (profile, axis)
+    # Both answers have to be exercised
+    assert 0 < found < 600
+
+def test_is_single_peaked():
+    rng = random.Random(1)
+    for _ in range(300):
+        alternatives = tuple(string.ascii_lowercase[:rng.randint(1, 6)])
+        profile = noisy_profile(rng, alternatives)
+        axis = rng.sample(alternatives, len(alternatives))
+        assert is_single_peaked(profile, axis, alternatives) == all(peaked_on(ballot, tuple(axis)) for ballot in profile), (profile, axis)
+
+if __name__ == "__main__":
+    test_single_peaked_axis()
+    test_is_single_peaked()
+    print("ok")
@@ -0,0 +1,104 @@
+'''
+    $ Smith, Schwartz, uncovered and Banks sets of the bitset tournament in voting/profiles.py, read off every subset of candidates
+'''
+import itertools
+import random
+import string
+from hw1.p1 import voting_rules
+from voting.profiles import anonymous_profile, tournament
+from tests.helpers import random_profile
+
+def subsets(present: list):
+    '''
+        Nonempty subsets of present as sets, smallest first
+    '''
+    for size in range(1, len(present) + 1):
+        for subset in itertools.combinations(present, size):
+            yield set(subset)
+
+def dominant(beats: dict, subset: set, present: list) -> bool:
+    '''
+        Whether every member of subset beats every present alternative outside it
+    '''
+    return all(beats[x, y] for x in subset for y in present if y not in subset)
+
+def undominated(beats: dict, subset: set, present: list) -> bool:
+    '''
+        Whether no present alternative outside subset beats a member of it
+    '''
+    return not any(beats[y, x] for x in subset for y in present if y not in subset)
+
+def transitive_chain(beats: dict, subset: set) -> bool:
+    '''
+        Whether beats is a strict linear order on subset (no ties, no cycles)
+    '''
+    return all(beats[x, y] or beats[y, x] for x, y in itertools.combinations(subset, 2)) and \
+        len({sum(beats[x, y] for y in subset) for x in subset}) == len(subset)
+
+def brute_sets(beats: dict, present: list) -> dict:
+    '''
+        The four tournament solutions straight from their definitions
+    '''
+    everything = list(subsets(present))
+    smith = min((s for s in everything if dominant(beats, s, present)), key=len)
+    free = [s for s in everything if undominated(beats, s, present)]
+    schwartz = set().union(*(s for s in free if not any(t < s for t in free)))
+    uncovered = {y for y in present if not any(beats[x, y] and all(beats[x, z] for z in present if beats[y, z]) for x in present)}
+    chains = [s for s in everything if transitive_chain(beats, s)]
+    maximal = [s for s in chains if not any(s < t for t in chains)]
+    banks = {x for s in maximal for x in s if all(beats[x, y] for y in s if y != x)}
+    return {"smith": smith, "schwartz": schwartz, "uncovered": uncovered, "banks": banks}
+
+def random_tournament(rng: random.Random, alternatives: tuple) -> tuple:
+    '''
+        A tournament with ties, either from the majority of a random profile or from a random win loss matrix
+    '''
+    if rng.random() < 0.5:
+        profile = random_profile(rng, rng.randint(1, 6), alternatives, rng.choice((None, 2)))
+        graph = anonymous_profile.from_dict(profile, alternatives).majority_matrix.tournament
+    else:
+        matrix = [[0] * len(alternatives) for _ in alternatives]
+        for i, j in itertools.combinations(range(len(alternatives)), 2):
+            outcome = rng.random()
+            matrix[i][j], matrix[j][i] = int(outcome < 0.4), int(0.4 <= outcome < 0.8)
+        graph = tournament.from_matrix(matrix, alternatives)
+    beats = {(x, y): bool(graph.beats[i] >> j & 1) for i, x in enumerate(alternatives) for j, y in enumerate(alternatives)}
+    return graph, beats
+
+def test_tournament_solutions():
+    rng = random.Random(0)
+    for _ in range(300):
+        alternatives = tuple(string.ascii_lowercase[:rng.randint(1, 7)])
+        graph, beats = random_tournament(rng, alternatives)
+        # Sometimes only a subset of the candidates is present
+        if rng.random() < 0.3:
+            graph = graph.restrict(rng.sample(alternatives, rng.randint(1, len(alternatives))))
+        present = [alternatives[i] for i in graph.members()]
+        expected = brute_sets(beats, present)
+        assert graph.smith_set() == expected["smith"], (beats, present)
+        assert graph.schwartz_set() == expected["schwartz"], (beats, present)
+        assert graph.uncovered_set() == expected["uncovered"], (beats, present)
+        assert expected["schwartz"] <= expected["smith"]
+        banks = graph.banks_set(trials=5, seed=1)
+        assert banks and banks <= expected["banks"], (beats, present, banks)
+
+def test_copeland():
+    rng = random.Random(1)
+    for trial in range(200):
+        alternatives = tuple(string.ascii_lowercase[:rng.randint(1, 7)])
+        profile = random_profile(rng, rng.randint(1, 8), alternatives, rng.choice((None, 2)))
+        tie_score = (0, 0.5, 1)[trial % 3]
+        # Copeland scores counted from the ballots, pair by pair
+        score = {a: 0.0 for a in alternatives}
+        for a, b in itertools.permutations(alternatives, 2):
+            margin = sum(1 if ballot.index(a) < ballot.index(b) else -1 for ballot in profile.values())
+            score[a] += 1 if margin > 0 else tie_score if margin == 0 else 0
+        expected = {a for a in alternatives if score[a] == max(score.values())}
+        rules = voting_rules(profile, alternatives)
+        assert rules.weighted_profile.majority_matrix.tournament.copeland_winners(tie_score) == expected, (profile, tie_score)
+        assert rules.copeland_winner(tie_score) in expected, (profile, tie_score)
+
+if __name__ == "__main__":
+    test_tournament_solutions()
+    test_copeland()
+    print("ok")
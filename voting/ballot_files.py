@@ -0,0 +1,114 @@
+import os
+import json
+import itertools
+import numpy as np
+from voting.profiles import anonymous_profile, profile_store
+
+def read_profile(file_name: str, layout: str = "position", chunk_size: int = 1 << 14, cache: bool = False) -> tuple:
+    '''
+        $ Stream a ballot file in chunks of lines and return (ballots, alternatives, weight)
+            $ ballots[v][p] is the alternative (by index into alternatives) voter v puts in position p, int8 (int16 beyond 127 names)
+            $ alternatives is the label table, sorted, labels are whitespace separated tokens so names can be longer than one character
+            $ lines with a single token are the weight vector, empty lines are skipped
+            $ ValueError when rows hold different numbers of labels or a ballot repeats a label
+        $ layout "position": every line is a position and every column a voter (dataset.txt), "ballot": every line is a ballot
+        $ Caching is opt-in: with cache = True the parsed ballots are written next to the file (.cache.npy plus a .cache.json label
+          table, both ignored by git) and later calls memory-map them as long as the text file keeps its size and modification time
+    '''
+    source = os.stat(file_name)
+    stamp = {"size": source.st_size, "mtime_ns": source.st_mtime_ns, "layout": layout}
+    if cache:
+        cached = utils.read_cache(file_name, stamp)
+        if cached is not None:
+            return cached
+
+    table, rows, weight, width = {}, [], [], None
+    with open(file=file_name, mode="r") as f:
+        while True:
+            chunk = [line.split() for line in itertools.islice(f, chunk_size)]
+            if not chunk:
+                break
+            weight.extend(int(tokens[0]) for tokens in chunk if len(tokens) == 1)
+            chunk = [tokens for tokens in chunk if len(tokens) > 1]
+            if chunk:
+                # Every row (in this chunk and in the ones before) has to hold the same number of labels
+                lengths = {len(tokens) for tokens in chunk}
+                if width is None:
+                    width = min(lengths)
+                if lengths != {width}:
+                    raise ValueError(f"{file_name}: rows have different numbers of labels ({', '.join(map(str, sorted(lengths | {width})))})")
+                # Labels get an id on first sight, ids are sorted by label once the file is read
+                ids = np.fromiter((table.setdefault(token, len(table)) for tokens in chunk for token in tokens), dtype=np.int64)
+                rows.append(ids.reshape(len(chunk), -1))
+
+    alternatives = tuple(sorted(table))
+    relabel = np.empty(len(table), dtype=np.int64)
+    relabel[[table[alternative] for alternative in alternatives]] = np.arange(len(alternatives))
+    dtype = np.int8 if len(alternatives) < 128 else np.int16
+    matrix = relabel[np.vstack(rows)] if rows else np.empty((0, 0), dtype=np.int64)
+    # Position major files hold one position per row, a transpose gives one ballot per row
+    ballots = np.ascontiguousarray(matrix.T if layout == "position" else matrix).astype(dtype)
+    ordered = np.sort(ballots, axis=1)
+    if (ordered[:, 1:] == ordered[:, :-1]).any():
+        raise ValueError(f"{file_name}: a ballot lists the same alternative more than once")
+
+    if cache:
+        utils.write_cache(file_name, stamp, ballots, alternatives, weight)
+    return ballots, alternatives, weight
+
+def load_profile(file_name: str, layout: str = "position", cache: bool = False) -> tuple:
+    '''
+        $ Read a ballot file straight into an anonymous_profile (distinct ballots with multiplicities), returns (profile, weight)
+    '''
+    ballots, alternatives, weight = read_profile(file_name, layout, cache=cache)
+    return anonymous_profile.from_ballots(ballots, alternatives), weight
+
+def load_store(file_name: str, layout: str = "position") -> tuple:
+    '''
+        $ Read a ballot file into a memory-mapped profile_store backed by its binary cache, returns (profile, weight)
+        $ This always writes the cache next to the file, the store reads from it
+        $ Falls back to an in-memory anonymous_profile when the cache cannot be written
+    '''
+    ballots, alternatives, weight = read_profile(file_name, layout, cache=True)
+    array_path, _ = utils.cache_paths(file_name)
+    if not os.path.exists(array_path):
+        return anonymous_profile.from_ballots(ballots, alternatives), weight
+    return profile_store(array_path, alternatives), weight
+
+class utils:
+    '''
+        $ Helpers for the binary cache of read_profile
+    '''
+
+    def cache_paths(file_name: str) -> tuple:
+        '''
+            $ Ballot array and label table written next to the text file
+        '''
+        return file_name + ".cache.npy", file_name + ".cache.json"
+
+    def read_cache(file_name: str, stamp: dict) -> tuple:
+        '''
+            $ Memory-map the cached ballots when the cache belongs to this version of the file, None otherwise
+        '''
+        array_path, table_path = utils.cache_paths(file_name)
+        try:
+            with open(table_path, mode="r") as f:
+                table = json.load(f)
+            if table["stamp"] != stamp:
+                return None
+            return np.load(array_path, mmap_mode="r"), tuple(table["alternatives"]), table["weight"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def write_cache(file_name: str, stamp: dict, ballots: np.ndarray, alternatives: tuple, weight: list):
+        '''
+            $ Write the cache, a read-only directory just means there is no cache
+        '''
+        array_path, table_path = utils.cache_paths(file_name)
+        try:
+            np.save(array_path, ballots)
+            # Label table last, a cache without it is never read
+            with open(table_path, mode="w") as f:
+                json.dump({"stamp": stamp, "alternatives": list(alternatives), "weight": weight}, f)
+        except OSError:
+            pass
@@ -0,0 +1,148 @@
+import string
+import numpy as np
+from voting.profiles import anonymous_profile, profile_store
+from voting.profiles import utils as profile_utils
+
+def impartial_culture(num_voters: int, num_alternatives: int, seed: int = None) -> np.ndarray:
+    '''
+        Ballots drawn uniformly from all rankings, ballots[v][p] is the alternative (by index) voter v puts in position p
+    '''
+    rng = np.random.default_rng(seed)
+    ballots = np.empty((num_voters, num_alternatives), dtype=utils.dtype(num_alternatives))
+    for start in range(0, num_voters, utils.BLOCK):
+        rows = min(utils.BLOCK, num_voters - start)
+        ballots[start:start + rows] = rng.permuted(np.broadcast_to(np.arange(num_alternatives), (rows, num_alternatives)), axis=1)
+    return ballots
+
+def mallows(num_voters: int, num_alternatives: int, phi: float, reference: list = None, seed: int = None) -> np.ndarray:
+    '''
+        Ballots from the Mallows model around reference (0, 1, ..., m-1 by default) with dispersion phi in [0, 1]
+        A ranking at Kendall tau distance d from reference has probability proportional to phi ** d, phi = 0 only gives
+        reference and phi = 1 is impartial culture
+        Repeated insertion: the i-th alternative of reference goes to position j <= i with probability proportional to
+        phi ** (i - j), one vectorized step per alternative for all voters of a block on the positions, inverted at the end
+    '''
+    rng = np.random.default_rng(seed)
+    reference = np.arange(num_alternatives) if reference is None else np.asarray(reference)
+    ballots = np.empty((num_voters, num_alternatives), dtype=utils.dtype(num_alternatives))
+    for start in range(0, num_voters, utils.BLOCK):
+        rows = min(utils.BLOCK, num_voters - start)
+        # position[i][v] is where the i-th alternative of reference currently sits on ballot v (one contiguous row per alternative)
+        position = np.empty((num_alternatives, rows), dtype=ballots.dtype)
+        draws = rng.random((num_alternatives, rows))
+        for i in range(num_alternatives):
+            cdf = np.cumsum(float(phi) ** np.arange(i, -1, -1))
+            # The slot is the number of cumulative probabilities the draw reaches (a draw is below 1, so at most i)
+            slot = np.searchsorted(cdf / cdf[-1], draws[i], side="right").astype(ballots.dtype)
+            # Alternatives at or after the slot move one position down
+            position[:i] += position[:i] >= slot
+            position[i] = slot
+        ballots[start:start + rows] = reference[profile_utils.invert_ballots(position.T)]
+    return ballots
+
+def urn(num_voters: int, num_alternatives: int, alpha: float, seed: int = None) -> np.ndarray:
+    '''
+        Ballots from the Polya-Eggenberger urn: the urn starts with every ranking once, and each drawn ranking is put back together
+        with alpha * m! copies, so alpha = 0 is impartial culture and a large alpha gives a few big blocks of identical voters
+        Voter t draws a fresh ranking with probability 1 / (1 + t * alpha) and otherwise copies a uniformly chosen earlier voter;
+        copy chains are resolved by pointer jumping, so only the fresh rankings are ever sampled
+    '''
+    rng = np.random.default_rng(seed)
+    voters = np.arange(num_voters)
+    fresh = rng.random(num_voters) * (1 + voters * float(alpha)) < 1
+    # Every voter points at itself (fresh) or at an earlier voter, jumping halves the chains until all point at a fresh voter
+    root = np.where(fresh, voters, (rng.random(num_voters) * voters).astype(np.int64))
+    while not fresh[root].all():
+        root = root[root]
+    index = np.cumsum(fresh) - 1
+    return impartial_culture(int(fresh.sum()), num_alternatives, rng)[index[root]]
+
+def single_peaked(num_voters: int, num_alternatives: int, method: str = "walsh", axis: list = None, seed: int = None) -> np.ndarray:
+    '''
+        Ballots single-peaked on axis (0, 1, ..., m-1 by default)
+            - "walsh": uniform over all single-peaked rankings, the ballot is filled from the bottom by taking the left or the
+              right end of the remaining axis with a fair coin
+            - "conitzer": uniform peak, the ballot is filled from the top by extending the interval around the peak to the left
+              or to the right with a fair coin (only one side once the other is used up)
+    '''
+    rng = np.random.default_rng(seed)
+    axis = np.arange(num_alternatives) if axis is None else np.asarray(axis)
+    ballots = np.empty((num_voters, num_alternatives), dtype=utils.dtype(num_alternatives))
+    for start in range(0, num_voters, utils.BLOCK):
+        rows = min(utils.BLOCK, num_voters - start)
+        block = ballots[start:start + rows]
+        coins = rng.random((rows, num_alternatives)) < 0.5
+        if method == "walsh":
+            left, right = np.zeros(rows, dtype=np.int64), np.full(rows, num_alternatives - 1)
+            for position in range(num_alternatives - 1, 0, -1):
+                take_left = coins[:, position]
+                block[:, position] = axis[np.where(take_left, left, right)]
+                left += take_left
+                right -= ~take_left
+            block[:, 0] = axis[left]
+        elif method == "conitzer":
+            peak = rng.integers(num_alternatives, size=rows)
+            left, right = peak - 1, peak + 1
+            block[:, 0] = axis[peak]
+            for position in range(1, num_alternatives):
+                take_left = np.where((left >= 0) & (right < num_alternatives), coins[:, position], left >= 0)
+                block[:, position] = axis[np.where(take_left, left, right)]
+                left -= take_left
+                right += ~take_left
+        else:
+            raise ValueError(f"unknown single-peaked method {method!r}")
+    return ballots
+
+def generate(model: str, num_voters: int, num_alternatives: int, seed: int = None, **parameters) -> np.ndarray:
+    '''
+        Ballots of one of the models by name: "impartial_culture", "mallows" (phi, reference), "urn" (alpha) or
+        "single_peaked" (method, axis)
+    '''
+    models = {"impartial_culture": impartial_culture, "mallows": mallows, "urn": urn, "single_peaked": single_peaked}
+    return models[model](num_voters, num_alternatives, seed=seed, **parameters)
+
+def generate_profile(model: str, num_voters: int, alternatives: tuple, seed: int = None, **parameters) -> anonymous_profile:
+    '''
+        Generated ballots compressed into an anonymous_profile over alternatives
+    '''
+    return anonymous_profile.from_ballots(generate(model, num_voters, len(alternatives), seed, **parameters), alternatives)
+
+def generate_store(path: str, model: str, num_voters: int, alternatives: tuple, seed: int = None, **parameters) -> profile_store:
+    '''
+        Generated ballots written to a memory-mapped profile_store at path (one row per voter, no compression)
+    '''
+    ballots = generate(model, num_voters, len(alternatives), seed, **parameters)
+    return profile_store.write(path, [ballots], num_voters, alternatives)
+
+class utils:
+    '''
+        Helpers shared by the generators
+    '''
+
+    # Voters generated per vectorized step, bounds the temporary arrays
+    BLOCK = 1 << 20
+
+    def dtype(num_alternatives: int):
+        '''
+            Same compact ballot type as the rest of the code, int8 up to 127 alternatives
+        '''
+        return np.int8 if num_alternatives < 128 else np.int16
+
+    def labels(num_alternatives: int) -> tuple:
+        '''
+            Alternative names a, b, c, ... (0, 1, 2, ... beyond 26 alternatives)
+        '''
+        if num_alternatives <= 26:
+            return tuple(string.ascii_lowercase[:num_alternatives])
+        return tuple(str(i) for i in range(num_alternatives))
+
+if __name__ == "__main__":
+    import time
+
+    alternatives = utils.labels(10)
+    for model, parameters in [("impartial_culture", {}), ("mallows", {"phi": 0.8}), ("urn", {"alpha": 0.1}), ("single_peaked", {"method": "walsh"})]:
+        start = time.perf_counter()
+        ballots = generate(model, 10_000_000, len(alternatives), seed=0, **parameters)
+        elapsed = time.perf_counter() - start
+        score = anonymous_profile.from_ballots(ballots[:100_000], alternatives).positional_scores(profile_utils.scoring_vector("borda", len(alternatives)))
+        print(f"{model:<18} 10M ballots in {elapsed:5.2f} s, Borda winner of the first 100k: {alternatives[int(score.argmax())]}")
@@ -0,0 +1,689 @@
+import random
+import functools
+import numpy as np
+
+class anonymous_profile:
+    '''
+        Compressed profile that stores every distinct ranking once together with the number of voters that cast it
+        Rules weight each row by its multiplicity, so work and memory scale with distinct ballots instead of voters
+    '''
+
+    def __init__(self, ballots: np.ndarray, counts: np.ndarray, alternatives: tuple):
+        '''
+            Initialize class
+            ballots[k][p] is the alternative (by index) in position p of the k-th ballot, counts[k] is how many voters cast it
+        '''
+        self.ballots = ballots
+        self.counts = counts
+        self.alternatives = alternatives
+        self.NUM_VOTERS = int(counts.sum())
+        # Rank matrix (ballots x alternatives), entry [k][i] is the position of alternative i on ballot k
+        self.ranks = utils.invert_ballots(ballots)
+
+    @classmethod
+    def from_ballots(cls, ballots: np.ndarray, alternatives: tuple):
+        '''
+            Compress a ballot matrix (one row per voter) by merging identical rows
+        '''
+        ballots, counts = np.unique(ballots, axis=0, return_counts=True)
+        return cls(ballots, counts.astype(np.int64), alternatives)
+
+    @classmethod
+    def from_dict(cls, profile: dict, alternatives: tuple):
+        '''
+            Compress a voter -> ballot dictionary
+        '''
+        return cls.from_ballots(utils.generate_ballot_matrix(profile, alternatives), alternatives)
+
+    @classmethod
+    def from_voters(cls, profile: dict, alternatives: tuple):
+        '''
+            Wrap a voter -> ballot dictionary without compressing it, row v is the v-th voter with multiplicity 1
+        '''
+        ballots = utils.generate_ballot_matrix(profile, alternatives)
+        return cls(ballots, np.ones(len(ballots), dtype=np.int64), alternatives)
+
+    def __len__(self) -> int:
+        '''
+            Number of distinct ballots
+        '''
+        return len(self.counts)
+
+    def blocks(self, block_size: int = 1 << 20):
+        '''
+            Iterate over (ballots, ranks, counts) slices of at most block_size rows
+            Everything that only adds up ballot by ballot reads a profile this way, see profile_store for profiles kept on disk
+        '''
+        for start in range(0, len(self), block_size):
+            yield self.ballots[start:start + block_size], self.ranks[start:start + block_size], self.counts[start:start + block_size]
+
+    def items(self):
+        '''
+            Iterate over (ballot, multiplicity) pairs with the ballot spelled out in alternative names
+        '''
+        for ballot, count in zip(self.ballots.tolist(), self.counts.tolist()):
+            yield [self.alternatives[i] for i in ballot], count
+
+    def to_dict(self) -> dict:
+        '''
+            Return the distinct ballots as a dictionary (one key per distinct ballot, not per voter)
+        '''
+        return {"b"+str(idx+1): ballot for idx, (ballot, _) in enumerate(self.items())}
+
+    @functools.cached_property
+    def position_matrix(self) -> np.ndarray:
+        '''
+            Entry [p][i] is the number of voters that put alternative i in position p, counted on first access only
+            Every positional scoring rule is a weight vector times this matrix, so it is all the rules ever need from the ballots
+            The ballots are read in blocks of rows (one bincount per block) and never inverted into ranks
+        '''
+        num_alternatives = len(self.alternatives)
+        matrix = np.zeros(num_alternatives * num_alternatives, dtype=np.int64)
+        for start in range(0, len(self.ballots), 1 << 18):
+            matrix += utils.count_positions(np.asarray(self.ballots[start:start + (1 << 18)]), self.counts[start:start + (1 << 18)])
+        return matrix.reshape(num_alternatives, num_alternatives)
+
+    def positional_scores(self, weights) -> np.ndarray:
+        '''
+            Scores of all alternatives under a positional scoring rule, weights[p] is what a ballot gives to its p-th alternative
+            A shorter weight vector is padded with zeros (truncated ballots), see utils.scoring_vector for the usual rules
+            A matrix of weights (one rule per row) is scored in one matrix product and gives one row of scores per rule
+        '''
+        weights = np.asarray(weights)
+        matrix = utils.to_weight_matrix(np.atleast_2d(weights), len(self.alternatives)) @ self.position_matrix
+        return matrix[0] if weights.ndim == 1 else matrix
+
+    @functools.cached_property
+    def majority_matrix(self):
+        '''
+            Weighted majority matrix of the profile, pairwise comparisons are counted on first access only
+        '''
+        return majority_matrix(utils.generate_pairwise_matrix(self.ranks, self.counts), self.alternatives, self.NUM_VOTERS)
+
+class profile_store(anonymous_profile):
+    '''
+        Profile kept on disk as a memory-mapped fixed-width ballot array (.npy, int8 or int16, one row per voter)
+        Rules and pairwise counts read it in blocks of rows, so only the pages of the current block are in memory; the whole rank
+        matrix (ranks) is only built when some code asks for it
+    '''
+
+    def __init__(self, path: str, alternatives: tuple):
+        '''
+            Open the ballot array at path, ballots[v][p] is the alternative (by index) voter v puts in position p
+        '''
+        self.path = path
+        self.ballots = np.load(path, mmap_mode="r")
+        self.alternatives = alternatives
+        self.NUM_VOTERS = len(self.ballots)
+        # Every row is one voter, a broadcast view keeps the counts from taking any memory
+        self.counts = np.broadcast_to(np.int64(1), (self.NUM_VOTERS,))
+
+    @classmethod
+    def write(cls, path: str, blocks, num_voters: int, alternatives: tuple):
+        '''
+            Write ballot blocks (arrays of alternative indices, num_voters rows in total) to path one block at a time and open the store
+        '''
+        dtype = np.int8 if len(alternatives) < 128 else np.int16
+        ballots = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(num_voters, len(alternatives)))
+        start = 0
+        for block in blocks:
+            ballots[start:start + len(block)] = block
+            start += len(block)
+        if start != num_voters:
+            raise ValueError(f"expected {num_voters} ballots, got {start}")
+        ballots.flush()
+        del ballots
+        return cls(path, alternatives)
+
+    @functools.cached_property
+    def ranks(self):
+        '''
+            Whole rank matrix in memory, built on first access only (blocks() avoids it)
+        '''
+        return utils.invert_ballots(np.asarray(self.ballots))
+
+    def blocks(self, block_size: int = 1 << 20):
+        '''
+            Iterate over (ballots, ranks, counts) slices of at most block_size rows, ranks are computed per block
+        '''
+        for start in range(0, self.NUM_VOTERS, block_size):
+            ballots = np.asarray(self.ballots[start:start + block_size])
+            yield ballots, utils.invert_ballots(ballots), self.counts[start:start + block_size]
+
+    @functools.cached_property
+    def majority_matrix(self):
+        '''
+            Majority matrix summed block by block
+        '''
+        pairs = np.zeros((len(self.alternatives), len(self.alternatives)), dtype=np.int64)
+        for _, ranks, counts in self.blocks():
+            pairs += utils.generate_pairwise_matrix(ranks, counts)
+        return majority_matrix(pairs, self.alternatives, self.NUM_VOTERS)
+
+class profile_batch:
+    '''
+        Many elections over the same alternatives with the same number of voters, held as one 3-D ballot array
+        (elections x voters x positions, entry [e][v][p] is the alternative (by index) voter v of election e puts in position p)
+        Every rule runs on all elections at once with array operations over blocks of elections, so a study of millions of small
+        elections pays the Python overhead once per block instead of once per election
+        Rules return a boolean matrix (elections x alternatives) marking the winners, ties keep every tied alternative
+    '''
+
+    def __init__(self, ballots: np.ndarray, alternatives: tuple, block_size: int = 1 << 22):
+        '''
+            Initialize class
+            Elections are processed in blocks of about block_size ballot entries (elections x voters x positions)
+        '''
+        self.ballots = np.asarray(ballots)
+        self.alternatives = alternatives
+        self.NUM_ELECTIONS, self.NUM_VOTERS = self.ballots.shape[:2]
+        self.block = max(1, block_size // max(1, self.NUM_VOTERS * len(alternatives)))
+
+    @classmethod
+    def from_dicts(cls, profiles: list, alternatives: tuple):
+        '''
+            Stack voter -> ballot dictionaries (all with the same number of voters) into one batch
+        '''
+        return cls(np.stack([utils.generate_ballot_matrix(profile, alternatives) for profile in profiles]), alternatives)
+
+    def __len__(self) -> int:
+        '''
+            Number of elections
+        '''
+        return self.NUM_ELECTIONS
+
+    def evaluate(self, rule) -> np.ndarray:
+        '''
+            Apply rule (a function of a 3-D block of ballots) to every block of elections and stack the results
+        '''
+        return np.concatenate([rule(self.ballots[start:start + self.block]) for start in range(0, len(self), self.block)])
+
+    def winner_sets(self, winners: np.ndarray) -> list:
+        '''
+            Spell a winner matrix out as one set of alternative names per election
+        '''
+        return [{self.alternatives[i] for i in np.flatnonzero(row)} for row in winners]
+
+    def positional_scores(self, weights) -> np.ndarray:
+        '''
+            Scores (elections x alternatives) under a positional scoring rule, or (rules x elections x alternatives) for a weight matrix
+            Weights are padded or cut to one per position as in anonymous_profile.positional_scores
+        '''
+        weights = np.asarray(weights)
+        matrix = utils.to_weight_matrix(np.atleast_2d(weights), len(self.alternatives))
+        scores = np.moveaxis(self.evaluate(lambda block: np.swapaxes(utils.batch_position_matrix(block), 1, 2) @ matrix.T), -1, 0)
+        return scores[0] if weights.ndim == 1 else scores
+
+    def positional_winners(self, weights) -> np.ndarray:
+        '''
+            Winners of the positional scoring rule(s) given by weights, one winner matrix per rule for a weight matrix
+        '''
+        scores = self.positional_scores(weights)
+        return scores == scores.max(axis=-1, keepdims=True)
+
+    def plurality(self) -> np.ndarray:
+        '''
+            Plurality winners of every election
+        '''
+        return self.positional_winners(utils.scoring_vector("plurality", len(self.alternatives)))
+
+    def borda_count(self) -> np.ndarray:
+        '''
+            Borda winners of every election
+        '''
+        return self.positional_winners(utils.scoring_vector("borda", len(self.alternatives)))
+
+    def approval_voting(self) -> np.ndarray:
+        '''
+            Approval winners of every election, odd voters (1st, 3rd, ...) approve their top 4 and even voters their top 2 as in voting_rules
+        '''
+        def approval(block):
+            ranks = utils.invert_ballots(block)
+            return (ranks[:, 0::2] < 4).sum(axis=1) + (ranks[:, 1::2] < 2).sum(axis=1)
+        scores = self.evaluate(approval)
+        return scores == scores.max(axis=1, keepdims=True)
+
+    def pairs(self) -> np.ndarray:
+        '''
+            Majority matrices (elections x alternatives x alternatives), entry [e][i][j] counts the voters of election e ranking i above j
+        '''
+        return self.evaluate(lambda block: utils.batch_pairwise_matrix(utils.invert_ballots(block)))
+
+    def condorcet_winner(self) -> np.ndarray:
+        '''
+            Condorcet winners (at most one per election, a row of False when there is none)
+        '''
+        pairs = self.pairs()
+        beats = pairs > np.swapaxes(pairs, 1, 2)
+        beats[:, np.arange(len(self.alternatives)), np.arange(len(self.alternatives))] = True
+        return beats.all(axis=2)
+
+    def copeland_winner(self, tie_score: float = 0.5) -> np.ndarray:
+        '''
+            Copeland winners, a pairwise win is worth 1 point and a pairwise tie tie_score points
+        '''
+        pairs = self.pairs()
+        ties = pairs == np.swapaxes(pairs, 1, 2)
+        ties[:, np.arange(len(self.alternatives)), np.arange(len(self.alternatives))] = False
+        score = (pairs > np.swapaxes(pairs, 1, 2)).sum(axis=2) + tie_score * ties.sum(axis=2)
+        return score == score.max(axis=1, keepdims=True)
+
+    def single_transferable_vote(self) -> np.ndarray:
+        '''
+            STV winners, see utils.batch_single_transferable_vote for how they relate to voting_rules
+        '''
+        order = np.argsort(np.argsort(np.array(self.alternatives, dtype=object)))
+        return self.evaluate(lambda block: utils.batch_single_transferable_vote(block, order))
+
+class majority_matrix:
+    '''
+        Weighted majority matrix: entry [i][j] is the number of voters that rank alternative i above alternative j
+        Condorcet, Copeland, tie breaking, knockout probabilities and control analysis all read from this one object
+    '''
+
+    def __init__(self, pairs: np.ndarray, alternatives: tuple, num_voters: int):
+        '''
+            Initialize class
+        '''
+        self.pairs = pairs
+        self.alternatives = alternatives
+        self.NUM_VOTERS = num_voters
+
+    def margins(self) -> np.ndarray:
+        '''
+            Majority margins, entry [i][j] is (voters preferring i to j) - (voters preferring j to i)
+        '''
+        return self.pairs - self.pairs.T
+
+    def wins(self) -> np.ndarray:
+        '''
+            Boolean matrix, entry [i][j] is True when alternative i beats alternative j by a strict majority
+        '''
+        return self.pairs > self.pairs.T
+
+    def win_loss_matrix(self) -> list:
+        '''
+            NxN list of 1's and 0's where position [i][j] is 1 if alternative i beats alternative j by a strict majority
+        '''
+        return self.wins().astype(int).tolist()
+
+    def probabilities(self) -> np.ndarray:
+        '''
+            Entry [i][j] is the probability that a random voter prefers alternative i to alternative j
+        '''
+        return self.pairs / self.NUM_VOTERS
+
+    def condorcet_winner(self) -> set:
+        '''
+            Return the set of alternatives that beat every other alternative by a strict majority (at most one)
+        '''
+        beats = self.wins()
+        np.fill_diagonal(beats, True)
+        return {self.alternatives[i] for i in np.flatnonzero(beats.all(axis=1))}
+
+    def copeland_scores(self, tie_score: float = 0.5) -> np.ndarray:
+        '''
+            Copeland score of every alternative: 1 point per pairwise win and tie_score points per pairwise tie
+        '''
+        wins = self.wins()
+        ties = self.pairs == self.pairs.T
+        np.fill_diagonal(ties, False)
+        return wins.sum(axis=1) + tie_score * ties.sum(axis=1)
+
+    def restrict(self, alternatives) -> 'majority_matrix':
+        '''
+            Majority matrix of the profile restricted to the given alternatives (in the given order)
+        '''
+        position = {self.alternatives[i]: i for i in range(len(self.alternatives))}
+        idx = [position[alternative] for alternative in alternatives]
+        return majority_matrix(self.pairs[np.ix_(idx, idx)], tuple(alternatives), self.NUM_VOTERS)
+
+    @functools.cached_property
+    def tournament(self) -> 'tournament':
+        '''
+            Majority graph of the matrix as bitsets (strict wins and ties), built on first access only
+        '''
+        ties = self.pairs == self.pairs.T
+        np.fill_diagonal(ties, False)
+        return tournament(utils.to_bitsets(self.wins()), utils.to_bitsets(ties), self.alternatives)
+
+class tournament:
+    '''
+        Majority graph stored as bitsets: bit j of beats[i] is set when alternative i beats alternative j, bit j of ties[i] when they tie
+        Every query only looks at the candidates in the present mask, so scores are popcounts and removing candidates clears bits
+        of the mask instead of rebuilding a matrix
+    '''
+
+    def __init__(self, beats: list, ties: list, alternatives: tuple, present: int = None):
+        '''
+            Initialize class
+        '''
+        self.beats = beats
+        self.ties = ties
+        self.alternatives = alternatives
+        self.position = {alternatives[i]: i for i in range(len(alternatives))}
+        self.present = (1 << len(alternatives)) - 1 if present is None else present
+
+    @classmethod
+    def from_matrix(cls, matrix: list, alternatives: tuple):
+        '''
+            Read a 0/1 win loss matrix ([i][j] is 1 when i beats j), pairs where neither entry is set are ties
+        '''
+        wins = np.asarray(matrix, dtype=bool)
+        ties = ~(wins | wins.T)
+        np.fill_diagonal(ties, False)
+        return cls(utils.to_bitsets(wins), utils.to_bitsets(ties), alternatives)
+
+    def mask(self, alternatives) -> int:
+        '''
+            Bitset of the given alternatives (names)
+        '''
+        return utils.to_mask(self.position[alternative] for alternative in alternatives)
+
+    def members(self, mask: int = None) -> list:
+        '''
+            Indices of the candidates in mask (the present ones by default), lowest first
+        '''
+        return utils.members(self.present if mask is None else mask)
+
+    def restrict(self, alternatives) -> 'tournament':
+        '''
+            The same graph with only the given alternatives present (shares the bitsets)
+        '''
+        return tournament(self.beats, self.ties, self.alternatives, self.present & self.mask(alternatives))
+
+    def remove(self, alternatives) -> 'tournament':
+        '''
+            The same graph with the given alternatives deleted (shares the bitsets)
+        '''
+        return tournament(self.beats, self.ties, self.alternatives, self.present & ~self.mask(alternatives))
+
+    def wins(self, i: int) -> int:
+        '''
+            Number of present candidates that candidate i beats
+        '''
+        return (self.beats[i] & self.present).bit_count()
+
+    def copeland_scores(self, tie_score: float = 0.5) -> dict:
+        '''
+            Copeland score of every present alternative: 1 point per pairwise win and tie_score points per pairwise tie
+        '''
+        return {self.alternatives[i]: self.wins(i) + tie_score * (self.ties[i] & self.present).bit_count() for i in self.members()}
+
+    def copeland_winners(self, tie_score: float = 0.5) -> set:
+        '''
+            Present alternatives with the highest Copeland score
+        '''
+        score = self.copeland_scores(tie_score)
+        return {alternative for alternative in score if score[alternative] == max(score.values())}
+
+    def beaten_by(self, i: int) -> int:
+        '''
+            Bitset of the present candidates that beat candidate i (the reverse edges come from the complement, no transpose needed)
+        '''
+        return self.present & ~(self.beats[i] | self.ties[i] | (1 << i))
+
+    def components(self, edges: list, reverse: list) -> list:
+        '''
+            Strongly connected components (bitsets) of the graph over the present candidates, sources of the condensation first
+            Kosaraju: one DFS over edges records finishing order, a second pass over reverse peels off one component per root;
+            neighbours are found by masking, so both passes are linear in the number of candidates times the bitset width
+        '''
+        order, seen = [], 0
+        for root in self.members():
+            if seen >> root & 1:
+                continue
+            seen |= 1 << root
+            stack = [root]
+            while stack:
+                unseen = edges[stack[-1]] & self.present & ~seen
+                if unseen:
+                    v = (unseen & -unseen).bit_length() - 1
+                    seen |= 1 << v
+                    stack.append(v)
+                else:
+                    order.append(stack.pop())
+        found, seen = [], 0
+        for root in reversed(order):
+            if seen >> root & 1:
+                continue
+            component, frontier = 0, 1 << root
+            seen |= frontier
+            while frontier:
+                component |= frontier
+                reached = 0
+                for v in utils.members(frontier):
+                    reached |= reverse[v]
+                frontier = reached & self.present & ~seen
+                seen |= frontier
+            found.append(component)
+        return found
+
+    def smith_set(self) -> set:
+        '''
+            Top cycle: smallest set of present alternatives that each beat every alternative outside it
+            This is the source component of the "beats or ties" graph, whose condensation is a chain
+        '''
+        n = len(self.alternatives)
+        weak = [self.beats[i] | self.ties[i] for i in range(n)]
+        reverse = [self.present & ~self.beats[i] & ~(1 << i) for i in range(n)]
+        return {self.alternatives[i] for i in self.members(self.components(weak, reverse)[0])} if self.present else set()
+
+    def schwartz_set(self) -> set:
+        '''
+            Union of the minimal sets of present alternatives that no outside alternative beats
+            These are the source components of the strict "beats" graph
+        '''
+        reverse = [self.beaten_by(i) for i in range(len(self.alternatives))]
+        winners = 0
+        for component in self.components(self.beats, reverse):
+            if all(reverse[i] & ~component == 0 for i in utils.members(component)):
+                winners |= component
+        return {self.alternatives[i] for i in self.members(winners)}
+
+    def uncovered_set(self) -> set:
+        '''
+            Present alternatives that no other alternative covers, x covers y when x beats y and also beats everybody y beats
+        '''
+        return {self.alternatives[y] for y in self.members()
+                if not any(self.beats[y] & self.present & ~self.beats[x] == 0 for x in utils.members(self.beaten_by(y)))}
+
+    def banks_set(self, trials: int = 1, seed: int = None) -> set:
+        '''
+            Banks winners (tops of maximal transitive chains) found by building chains greedily, a subset of the Banks set
+            Every candidate is offered once and is inserted where the chain stays transitive (it has to lose to a prefix and beat
+            the rest); a candidate that does not fit never fits a larger chain, so one pass gives a maximal chain
+            The first chain offers candidates in index order, the other trials in random orders
+        '''
+        rng = random.Random(seed)
+        winners = set()
+        for trial in range(trials):
+            offered = self.members()
+            if trial > 0:
+                rng.shuffle(offered)
+            # Chain from its top down
+            chain, inside = [], 0
+            for z in offered:
+                above = self.beaten_by(z) & inside
+                below = self.beats[z] & inside
+                # Everybody above has to come before everybody below, and ties do not fit a transitive chain
+                if above | below == inside and utils.to_mask(chain[:above.bit_count()]) == above:
+                    chain.insert(above.bit_count(), z)
+                    inside |= 1 << z
+            if chain:
+                winners.add(self.alternatives[chain[0]])
+        return winners
+
+class utils:
+    '''
+        Array helpers behind the profile classes: ballot and rank matrices, pairwise and positional counts, bitsets
+    '''
+
+    def generate_ballot_matrix(profile: dict, alternatives: tuple) -> np.ndarray:
+        '''
+            Convert the profile into an integer matrix (voters x positions) where entry [v][p] is the alternative (by index) voter v puts in position p
+        '''
+        position = {alternatives[i]: i for i in range(len(alternatives))}
+        # int8 is enough for up to 127 alternatives
+        dtype = np.int8 if len(alternatives) < 128 else np.int16
+        ballots = np.fromiter((position[alternative] for preference in profile.values() for alternative in preference), dtype=dtype, count=len(profile)*len(alternatives))
+        return ballots.reshape(len(profile), len(alternatives))
+
+    def invert_ballots(ballots: np.ndarray) -> np.ndarray:
+        '''
+            Invert each ballot so that ranks[v][i] is the position of alternative i
+            Every rule reads from this matrix instead of calling preference.index(...) over and over
+            Stacked ballot arrays (elections x voters x positions) are inverted ballot by ballot as well
+        '''
+        flat = ballots.reshape(-1, ballots.shape[-1])
+        ranks = np.empty_like(flat)
+        ranks[np.arange(flat.shape[0])[:, None], flat] = np.arange(flat.shape[1], dtype=flat.dtype)
+        return ranks.reshape(ballots.shape)
+
+    def generate_pairwise_matrix(ranks: np.ndarray, counts: np.ndarray, block_size: int = 8192) -> np.ndarray:
+        '''
+            Return an NxN matrix where entry [i][j] is the number of voters that rank alternative i above alternative j
+            Ballots are processed in blocks (transposed so every comparison runs over contiguous memory) to bound the memory use
+        '''
+        num_alternatives = ranks.shape[1]
+        # Float weights let the comparisons go through a BLAS dot product, exact up to 2**53 voters
+        weights = counts.astype(np.float64)
+        pairs = np.zeros((num_alternatives, num_alternatives))
+        for start in range(0, ranks.shape[0], block_size):
+            block = np.ascontiguousarray(ranks[start:start + block_size].T)
+            block_weights = weights[start:start + block_size]
+            # Only the upper triangle is counted, the lower triangle is the complement
+            for i in range(num_alternatives - 1):
+                pairs[i, i+1:] += (block[i] < block[i+1:]).astype(np.float64) @ block_weights
+        pairs = pairs.astype(np.int64)
+        lower = np.triu(int(counts.sum()) - pairs, 1).T
+        return pairs + lower
+
+    def count_positions(ballots: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        '''
+            Flattened position matrix of a block of ballots, entry [p * m + i] is the weighted number of ballots with alternative i in position p
+            Offsetting column p by p * m turns the whole block into a single bincount
+        '''
+        num_alternatives = ballots.shape[1]
+        index = ballots + np.arange(0, num_alternatives * num_alternatives, num_alternatives)
+        # Float weights are exact up to 2**53 voters
+        weights = np.repeat(np.asarray(counts, dtype=np.float64), num_alternatives)
+        return np.bincount(index.ravel(), weights=weights, minlength=num_alternatives * num_alternatives).astype(np.int64)
+
+    def to_weight_matrix(weights: np.ndarray, num_alternatives: int) -> np.ndarray:
+        '''
+            Pad (with zeros) or cut every row of a weight matrix to one weight per position
+        '''
+        if weights.shape[1] >= num_alternatives:
+            return weights[:, :num_alternatives]
+        return np.pad(weights, ((0, 0), (0, num_alternatives - weights.shape[1])))
+
+    def scoring_vector(rule: str, num_alternatives: int, k: int = 1) -> np.ndarray:
+        '''
+            Weight vector of a common positional scoring rule over num_alternatives positions
+                - "plurality": (1, 0, ..., 0), "veto": (1, ..., 1, 0), "k-approval": k ones then zeros
+                - "borda": (m-1, m-2, ..., 0), "dowdall": (1, 1/2, 1/3, ..., 1/m), "truncated-borda": (k, k-1, ..., 1, 0, ..., 0)
+            Stack several of them (np.vstack) to score many rules in one call
+        '''
+        position = np.arange(num_alternatives)
+        if rule == "plurality":
+            return (position < 1).astype(np.int64)
+        if rule == "veto":
+            return (position < num_alternatives - 1).astype(np.int64)
+        if rule == "k-approval":
+            return (position < k).astype(np.int64)
+        if rule == "borda":
+            return num_alternatives - 1 - position
+        if rule == "dowdall":
+            return 1 / (position + 1)
+        if rule == "truncated-borda":
+            return np.maximum(k - position, 0)
+        raise ValueError(f"unknown scoring rule {rule!r}")
+
+    def batch_position_matrix(ballots: np.ndarray) -> np.ndarray:
+        '''
+            Position matrices of a block of elections (elections x positions x alternatives), a single bincount for the whole block
+        '''
+        num_elections, _, num_alternatives = ballots.shape
+        size = num_alternatives * num_alternatives
+        index = ballots + (np.arange(num_elections)[:, None, None] * size + np.arange(0, size, num_alternatives))
+        return np.bincount(index.ravel(), minlength=num_elections * size).reshape(num_elections, num_alternatives, num_alternatives)
+
+    def batch_pairwise_matrix(ranks: np.ndarray) -> np.ndarray:
+        '''
+            Majority matrices of a block of rank arrays (elections x voters x alternatives), one row of comparisons per alternative
+            Voters are moved to the last axis so every count runs over contiguous memory
+        '''
+        ranks = np.ascontiguousarray(np.swapaxes(ranks, 1, 2))
+        return np.stack([np.count_nonzero(ranks[:, [i], :] < ranks, axis=2) for i in range(ranks.shape[1])], axis=1)
+
+    def batch_single_transferable_vote(ballots: np.ndarray, order: np.ndarray) -> np.ndarray:
+        '''
+            STV on a block of elections, every round is one array step for all elections that are still counting
+            The rounds follow voting_rules.single_transferable_vote, order[i] is the place of alternative i in sorted name order
+                - a ballot counts for its highest alternative that is not eliminated
+                - an election stops once some alternative holds more than n/2 + 1 ballots or exactly two alternatives hold ballots,
+                  the winners are the alternatives holding the most ballots (voting_rules picks one of them)
+                - otherwise the alternative holding the fewest ballots is eliminated, among tied ones the one with the fewest
+                  pairwise wins within the tie (a pairwise tie is a win for the later one in name order), then the first in name order
+            Where every alternative but one gets eliminated (two voters who agree all the way down) voting_rules runs out of
+            ballot positions and raises IndexError, here the last alternative standing wins
+        '''
+        num_elections, num_voters, num_alternatives = ballots.shape
+        ranks = utils.invert_ballots(ballots)
+        pairs = utils.batch_pairwise_matrix(ranks)
+        wins = pairs > np.swapaxes(pairs, 1, 2)
+        ties = pairs == np.swapaxes(pairs, 1, 2)
+        # earlier[i][j] is True when alternative j comes before alternative i in name order
+        earlier = order[None, :] < order[:, None]
+        by_name = np.argsort(order)
+        eliminated = np.zeros((num_elections, num_alternatives), dtype=bool)
+        winners = np.zeros((num_elections, num_alternatives), dtype=bool)
+        counting = np.ones(num_elections, dtype=bool)
+        offset = np.arange(num_elections)[:, None] * num_alternatives
+        for _ in range(num_alternatives):
+            # Current choice of every ballot, eliminated alternatives are pushed past the last position
+            choice = np.where(eliminated[:, None, :], num_alternatives, ranks).argmin(axis=2)
+            tally = np.bincount((choice + offset).ravel(), minlength=num_elections * num_alternatives).reshape(num_elections, num_alternatives)
+            holding = tally > 0
+            stop = (tally.max(axis=1) > num_voters // 2 + 1) | (holding.sum(axis=1) == 2) | (eliminated.sum(axis=1) == num_alternatives - 1)
+            done = counting & stop
+            winners[done] = tally[done] == tally[done].max(axis=1, keepdims=True)
+            counting &= ~done
+            if not counting.any():
+                break
+            low = np.where(holding, tally, num_voters + 1)
+            lowest = low == low.min(axis=1, keepdims=True)
+            # Pairwise points within the tied group, alternatives outside it can never be picked
+            inside = lowest[:, None, :]
+            score = np.where(lowest, (wins & inside).sum(axis=2) + (ties & earlier & inside).sum(axis=2), num_alternatives)
+            loser = by_name[score[:, by_name].argmin(axis=1)]
+            eliminated[np.flatnonzero(counting), loser[counting]] = True
+        return winners
+
+    def to_bitsets(matrix: np.ndarray) -> list:
+        '''
+            Row i of a boolean matrix as an int whose bit j is set when entry [i][j] is True
+        '''
+        rows = np.packbits(np.asarray(matrix, dtype=bool), axis=1, bitorder="little")
+        return [int.from_bytes(row.tobytes(), "little") for row in rows]
+
+    def to_mask(members) -> int:
+        '''
+            Bitset with the bits of members set
+        '''
+        mask = 0
+        for i in members:
+            mask |= 1 << i
+        return mask
+
+    def members(mask: int) -> list:
+        '''
+            Indices of the set bits of mask, lowest first
+        '''
+        found = []
+        while mask:
+            low = mask & -mask
+            found.append(low.bit_length() - 1)
+            mask ^= low
+        return found